@@ -1,8 +1,8 @@
 # api_setup.py
-from groq import Groq
-from langchain_groq import ChatGroq
-from huggingface_hub import InferenceClient
-from dotenv import load_dotenv
+# Client libraries are imported inside setup_apis so importing this module stays cheap
+from embedding_cache import cached_embedding_model
+from local_embeddings import load_local_embedding_model, HashingEmbeddingModel
+import numpy as np
 import os
 
 class HuggingFaceEmbeddingWrapper:
@@ -14,8 +14,21 @@ class HuggingFaceEmbeddingWrapper:
         embedding = self.client.feature_extraction(text, model=self.model)
         return embedding.tolist()  # Convert ndarray to list
 
+    def embed_documents(self, texts, batch_size=32):
+        """Embed texts in batches of `batch_size`, returning an (N, d) float32 matrix."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            embedding = self.client.feature_extraction(batch, model=self.model)
+            batches.append(np.asarray(embedding, dtype=np.float32).reshape(len(batch), -1))
+        return np.vstack(batches)
+
 def setup_apis():
     """Configure Groq and Huggingface APIs."""
+    from dotenv import load_dotenv
     load_dotenv()
     
     llms = {}
@@ -25,33 +38,49 @@ def setup_apis():
     groq_api_key = os.getenv("GROQ_API_KEY")
     if groq_api_key:
         try:
+            from langchain_groq import ChatGroq
             llms["groq"] = ChatGroq(
                 api_key=groq_api_key,
-                model="gemma2-9b-it"
+                model="gemma2-9b-it",
+                # Retries and deadlines are handled by llm_client; the HTTP timeout bounds abandoned calls
+                timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", "15")),
+                max_retries=0
             )
             print("✅ Groq API configured")
         except Exception as e:
             print(f"❌ Groq API setup failed: {e}")
     
-    # Huggingface API (Embeddings)
-    hf_api_key = os.getenv("HF_API_KEY")
-    if hf_api_key:
-        try:
-            client = InferenceClient(token=hf_api_key)
-            embeddings["huggingface"] = HuggingFaceEmbeddingWrapper(
-                client, "sentence-transformers/all-MiniLM-L6-v2"
-            )
-            print("✅ Huggingface embeddings configured")
-        except Exception as e:
-            print(f"❌ Huggingface embeddings failed: {e}")
+    # Embeddings backend: "huggingface" (remote, default) or "local" (offline)
+    backend = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+    if backend == "local":
+        model = load_local_embedding_model()
+        # Hashing embeddings are cheaper to recompute than to look up
+        embeddings["local"] = model if isinstance(model, HashingEmbeddingModel) else cached_embedding_model(model)
+        print(f"✅ Local embeddings configured ({model.model})")
+    else:
+        hf_api_key = os.getenv("HF_API_KEY")
+        if hf_api_key:
+            try:
+                from huggingface_hub import InferenceClient
+                client = InferenceClient(token=hf_api_key)
+                embeddings["huggingface"] = cached_embedding_model(
+                    HuggingFaceEmbeddingWrapper(client, "sentence-transformers/all-MiniLM-L6-v2")
+                )
+                print("✅ Huggingface embeddings configured")
+            except Exception as e:
+                print(f"❌ Huggingface embeddings failed: {e}")
     
     return llms, embeddings
 
+def get_embedding_model(embeddings):
+    """Return the configured embedding backend, preferring the remote one."""
+    return embeddings.get("huggingface") or embeddings.get("local")
+
 if __name__ == "__main__":
     llms, embeddings = setup_apis()
     if "groq" in llms:
         response = llms["groq"].invoke("Hello, generate a simple quiz question.")
         print(f"Groq response: {response.content}")
-    if "huggingface" in embeddings:
-        emb = embeddings["huggingface"].embed_query("Test sentence")
-        print(f"Huggingface embedding length: {len(emb)}")
\ No newline at end of file
+    for name, model in embeddings.items():
+        emb = model.embed_query("Test sentence")
+        print(f"{name} embedding length: {len(emb)}")
\ No newline at end of file
@@ -1,23 +1,149 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, send_from_directory, send_file, session, g, jsonify, abort
 from learning_assessment import (
     VARK_QUESTIONS,
-    assess_learning_style, extract_key_concepts, generate_mind_map,
-    search_web, generate_questions_from_concepts, load_or_process_documents,
-    assess_knowledge, personalize_learning, review_progress, update_user_profile
+    assess_learning_style, extract_key_concepts,
+    search_web, prefetch_web_search, load_or_process_documents,
+    assess_knowledge, personalize_learning, review_progress, update_user_profile, progress_summary,
+    fallback_questions
 )
-from api_setup import setup_apis
+from api_setup import setup_apis, get_embedding_model
+from vector_index import get_vector_index, retrieve_context
+from question_bank import serve_questions, stream_questions, question_refs, resolve_questions
+from question_stream import start_question_stream, take_streamed_questions, discard_question_stream
+from session_store import create_session_store, new_session_id
+from content_store import get_content_store, StoredContent
+from mind_map import request_mind_map, wait_for_mind_map, PLACEHOLDER_SVG
+from metrics import REGISTRY, increment, start_request_spans, finish_request_spans, server_timing
+from ingestion_jobs import get_ingestion_queue
+from prefetch import start_follow_up_prefetch, take_follow_up_prefetch, discard_follow_up_prefetch
 import os
+import re
+import threading
+import time
+import uuid
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'data/raw/'
 app.config['STATIC_FOLDER'] = 'static/'
+app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(32)  # Set it when running several workers
+session_store = create_session_store()
+# Serve each generated question as soon as the model has written it (QUESTION_STREAMING=1). Off by
+# default: streams are not coalesced, so identical concurrent requests each hold an LLM stream.
+STREAM_QUESTIONS = os.getenv("QUESTION_STREAMING", "").lower() in ("1", "true", "yes")
+QUESTIONS_PER_PHASE = 2
+# Add a Server-Timing header with each request's per-stage durations
+TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "").lower() in ("1", "true", "yes")
 
-llms, embeddings = setup_apis()
-if not llms.get("groq") or not embeddings.get("huggingface"):
-    raise Exception("Required APIs not available.")
-embedding_model = embeddings["huggingface"]
-grok_instance = llms["groq"]
+_apis = None
+_apis_lock = threading.Lock()
+
+def get_apis():
+    """(grok_instance, embedding_model), set up on first use so importing the app stays fast."""
+    global _apis
+    if _apis is None:
+        with _apis_lock:
+            if _apis is None:
+                llms, embeddings = setup_apis()
+                embedding_model = get_embedding_model(embeddings)
+                if not llms.get("groq") or not embedding_model:
+                    raise Exception("Required APIs not available.")
+                _apis = (llms["groq"], embedding_model)
+    return _apis
+
+def warm_up():
+    """Set up API clients and shared stores ahead of the first request.
+
+    Call it from a server hook (e.g. gunicorn's post_fork), or set WARM_UP_ON_START=1 to
+    run it on a background thread when the app is imported.
+    """
+    start_time = time.time()
+    get_apis()
+    get_content_store()
+    get_vector_index()
+    print(f"Warm-up completed (took {time.time() - start_time:.2f}s)")
+
+if os.getenv("WARM_UP_ON_START", "").lower() in ("1", "true", "yes"):
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+def ingest_documents(progress):
+    """Ingestion job body: bring the corpus up to date and return its document names."""
+    grok_instance, embedding_model = get_apis()
+    content, _ = load_or_process_documents(embedding_model=embedding_model, progress=progress)  # Only new or changed files are reprocessed
+    return list(content)
+
+def ingestion_queue():
+    return get_ingestion_queue(ingest_documents)
+
+def load_user_data():
+    """Learner state for this request's session, or None if the session has none."""
+    sid = session.get('sid')
+    user_data = session_store.get(sid) if sid else None
+    if user_data is not None:
+        user_data['used_questions'] = set(user_data.get('used_questions', []))
+        g.user_data = user_data
+    return user_data
+
+def new_user_data(state):
+    """Start a fresh session holding `state`."""
+    session['sid'] = new_session_id()
+    g.user_data = state
+    return state
+
+def user_content(user_data):
+    """Lazy view over the documents chosen for this learner."""
+    return StoredContent(get_content_store(), user_data.get('documents', []))
+
+def add_streamed_questions(user_data, timeout=15.0):
+    """Append questions the phase's stream has produced since the last request, waiting up to
+    `timeout` for the next one; returns False once the stream has nothing more to give."""
+    key = user_data.get('question_stream')
+    if not key:
+        return False
+    more = take_streamed_questions(key, len(user_data['questions']), timeout=timeout)
+    if more is None:  # Started by another worker process; serve the rest of the phase here
+        user_data.pop('question_stream')
+        remaining = QUESTIONS_PER_PHASE - len(user_data['questions'])
+        if remaining <= 0:
+            return False
+        grok_instance, _ = get_apis()
+        more, user_data['used_questions'] = serve_questions(grok_instance, user_data['concepts'], user_data['topic'], user_data.get('baseline_score', 0), num_questions=remaining, used_questions=user_data['used_questions'], user_name=user_data['name'], content=user_content(user_data))
+        user_data['questions'].extend(more)
+        return bool(more)
+    if not more:
+        discard_question_stream(user_data.pop('question_stream'))
+        return False
+    user_data['questions'].extend(more)
+    user_data['used_questions'].update(q['question'] for q in more)
+    return True
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.request_spans = start_request_spans()
+
+# Registered before save_user_data so it runs after it and includes the session write
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    totals = finish_request_spans(g.request_spans)
+    REGISTRY.observe("request_duration", elapsed, endpoint=request.endpoint or "unknown", method=request.method)
+    if TIMING_HEADER:
+        totals["total"] = (1, elapsed)
+        response.headers["Server-Timing"] = server_timing(totals)
+    return response
+
+@app.after_request
+def save_user_data(response):
+    user_data = g.pop('user_data', None)
+    if user_data is not None and session.get('sid'):
+        state = dict(user_data)
+        if 'questions' in state:
+            state['questions'] = question_refs(state['questions'])
+        session_store.set(session['sid'], state)
+    return response
 
 @app.route('/')
 def index():
@@ -28,15 +154,21 @@ def start_learning():
     if request.method == 'POST':
         name = request.form.get('name')
         topic = request.form.get('topic')
-        global user_data
-        user_data = {'name': name, 'topic': topic, 'step': 'vark', 'scores': {"V": 0, "A": 0, "R": 0, "K": 0}, 'used_questions': set(), 'vark_q': 0}
+        previous = load_user_data()
+        if previous and previous.get('prefetch_key'):
+            discard_follow_up_prefetch(previous['prefetch_key'])
+        if previous and previous.get('question_stream'):
+            discard_question_stream(previous['question_stream'])
+        if session.get('sid'):
+            session_store.delete(session['sid'])
+        new_user_data({'name': name, 'topic': topic, 'step': 'vark', 'scores': {"V": 0, "A": 0, "R": 0, "K": 0}, 'used_questions': set(), 'vark_q': 0})
         return redirect(url_for('learn'))
     return render_template('learn.html', step='start')
 
 @app.route('/learn', methods=['GET', 'POST'])
 def learn():
-    global user_data
-    if 'user_data' not in globals():
+    user_data = load_user_data()
+    if user_data is None:
         return redirect(url_for('start_learning'))
     
     if request.method == 'POST':
@@ -52,15 +184,15 @@ def learn():
             return redirect(url_for('learn'))
         
         elif user_data['step'] == 'upload':
-            force_reprocess = False
+            uploaded = []
             if 'file' in request.files and request.files['file'].filename:
                 file = request.files['file']
                 file.save(os.path.join(app.config['UPLOAD_FOLDER'], file.filename))
-                force_reprocess = True  # Only reprocess if a new file is uploaded
-            content, _ = load_or_process_documents(force_reprocess=force_reprocess)
-            user_data['content'] = content
-            user_data['step'] = 'baseline'
-            return redirect(url_for('quiz'))
+                uploaded.append(file.filename)
+            # Processing runs on the ingestion worker; the learner waits on a status page
+            user_data['ingestion_job'] = ingestion_queue().submit(uploaded)
+            user_data['step'] = 'ingesting'
+            return redirect(url_for('learn'))
         
         elif user_data['step'] == 'follow-up' and 'retry' in request.form:
             user_data['concepts'] = user_data['incorrect_concepts']
@@ -78,22 +210,40 @@ def learn():
     elif user_data['step'] == 'upload':
         return render_template('learn.html', step='upload')
     
+    elif user_data['step'] == 'ingesting':
+        job = ingestion_queue().status(user_data['ingestion_job'])
+        if job is not None and job['status'] not in ('done', 'failed'):
+            return render_template('learn.html', step='ingesting', job=job)
+        if job is not None and job['documents'] is not None:
+            user_data['documents'] = job['documents']
+        else:  # The job failed or was lost: go on with the documents already processed
+            user_data['documents'] = list(StoredContent(get_content_store()))
+        user_data.pop('ingestion_job')
+        user_data['step'] = 'baseline'
+        return redirect(url_for('quiz'))
+    
     elif user_data['step'] == 'follow-up':
         return redirect(url_for('quiz'))
     
     elif user_data['step'] == 'done':
+        prefetch_web_search(user_data['topic'], user_data['style'])  # Usually already cached since the follow-up began
         review_progress(user_data['name'])
         update_user_profile(user_data['name'], user_data['style'], user_data['topic'], user_data['baseline_score'], user_data['final_score'])
+        grok_instance, embedding_model = get_apis()
         resources = search_web(user_data['topic'], user_data['style'], grok_instance)
-        return render_template('learn.html', step='done', name=user_data['name'], topic=user_data['topic'], baseline_score=user_data['baseline_score'], final_score=user_data['final_score'], resources=resources)
+        return render_template('learn.html', step='done', name=user_data['name'], topic=user_data['topic'], baseline_score=user_data['baseline_score'], final_score=user_data['final_score'], resources=resources, mind_map=user_data.get('mind_map'))
     
     return render_template('learn.html', step=user_data['step'], error="Unexpected step, please restart.")
 
 @app.route('/quiz', methods=['GET', 'POST'])
 def quiz():
-    global user_data
-    if 'user_data' not in globals() or user_data['step'] not in ['baseline', 'follow-up']:
+    user_data = load_user_data()
+    if user_data is not None and user_data['step'] == 'ingesting':
+        return redirect(url_for('learn'))
+    if user_data is None or user_data['step'] not in ['baseline', 'follow-up']:
         return redirect(url_for('start_learning'))
+    if 'questions' in user_data:
+        user_data['questions'] = resolve_questions(user_data['questions'])
     
     if request.method == 'POST':
         user_answer = request.form.get('answer')
@@ -108,11 +258,14 @@ def quiz():
                     break
         
         user_data['q_index'] += 1
+        if user_data['q_index'] >= len(user_data['questions']):
+            add_streamed_questions(user_data)
         if user_data['q_index'] >= len(user_data['questions']):
             score = (user_data['correct'] / len(user_data['questions'])) * 100
             if user_data['step'] == 'baseline':
                 user_data['baseline_score'] = score
                 user_data['step'] = 'follow-up'
+                prefetch_web_search(user_data['topic'], user_data['style'])
                 print(f"Baseline completed: Score {score}%")
             else:
                 user_data['final_score'] = score
@@ -124,31 +277,92 @@ def quiz():
         return redirect(url_for('quiz'))
     
     if 'questions' not in user_data or user_data['q_index'] == 0:
-        concepts = extract_key_concepts(user_data['content'], user_data['topic'], embedding_model)
+        grok_instance, embedding_model = get_apis()
+        content = user_content(user_data)
+        prefetched = None
+        if user_data['step'] == 'follow-up' and user_data.get('prefetch_key'):
+            prefetched = take_follow_up_prefetch(user_data.pop('prefetch_key'))
+        if prefetched:
+            # Same topic and documents as the baseline, so the concepts are unchanged;
+            # concepts missed in the baseline are asked about first
+            missed = [c for c in prefetched['concepts'] if c in user_data.get('incorrect_concepts', [])]
+            concepts = missed + [c for c in prefetched['concepts'] if c not in missed]
+            context = prefetched['context']
+        else:
+            concepts = extract_key_concepts(content, user_data['topic'], embedding_model)
+            context = retrieve_context(get_vector_index(), embedding_model, concepts, filenames=list(content)) if content else ""
         user_data['concepts'] = concepts
         user_data['incorrect_concepts'] = []
-        questions, user_data['used_questions'] = generate_questions_from_concepts(grok_instance, concepts, user_data['topic'], user_data.get('baseline_score', 0), used_questions=user_data['used_questions'])
-        user_data['questions'] = questions
+        if user_data.get('question_stream'):
+            discard_question_stream(user_data.pop('question_stream'))
+        stream_key = uuid.uuid4().hex
+        if STREAM_QUESTIONS and start_question_stream(stream_key, lambda cancel: stream_questions(grok_instance, concepts, user_data['topic'], user_data.get('baseline_score', 0), num_questions=QUESTIONS_PER_PHASE, used_questions=set(user_data['used_questions']), user_name=user_data['name'], content=content, context=context, cancel=cancel)):
+            user_data['questions'] = []
+            user_data['question_stream'] = stream_key
+            if not add_streamed_questions(user_data):
+                user_data['questions'] = fallback_questions(concepts, user_data['topic'])
+        else:  # Streaming is off or every stream worker is busy
+            questions, user_data['used_questions'] = serve_questions(grok_instance, concepts, user_data['topic'], user_data.get('baseline_score', 0), num_questions=QUESTIONS_PER_PHASE, used_questions=user_data['used_questions'], user_name=user_data['name'], content=content, context=context)
+            user_data['questions'] = questions
         user_data['q_index'] = 0
         user_data['correct'] = 0
-        generate_mind_map(concepts, user_data['topic'])
+        user_data['mind_map'] = request_mind_map(user_data['topic'], concepts)
+        if user_data['step'] == 'baseline':
+            if user_data.get('prefetch_key'):
+                discard_follow_up_prefetch(user_data['prefetch_key'])
+            key = f"{user_data['name']}:{user_data['topic']}:{uuid.uuid4().hex}"
+            user_data['prefetch_key'] = start_follow_up_prefetch(key, grok_instance, embedding_model, user_data['topic'], concepts, content)
     
     q = user_data['questions'][user_data['q_index']]
     return render_template('quiz.html', question=q['question'], options=q['options'], phase=user_data['step'].capitalize())
 
-@app.route('/progress')
-def progress():
+def requested_progress():
+    """progress_summary for the name/page/per_page query args, or (None, error message)."""
     name = request.args.get('name')
     if not name:
-        return render_template('progress.html', error="Please provide a name.")
-    import io
-    import sys
-    old_stdout = sys.stdout
-    sys.stdout = io.StringIO()
-    review_progress(name)
-    progress_text = sys.stdout.getvalue()
-    sys.stdout = old_stdout
-    return render_template('progress.html', progress=progress_text)
+        return None, "Please provide a name."
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    summary = progress_summary(name, page=page, per_page=per_page)
+    if summary is None:
+        return None, "No progress found for this user yet."
+    return summary, None
+
+@app.route('/progress')
+def progress():
+    summary, error = requested_progress()
+    return render_template('progress.html', error=error, progress=summary)
+
+@app.route('/api/progress')
+def progress_json():
+    summary, error = requested_progress()
+    if error:
+        return jsonify({"error": error}), 400 if not request.args.get('name') else 404
+    return jsonify(summary)
+
+@app.route('/mind_map/<key>')
+def mind_map(key):
+    if not re.fullmatch(r"[0-9a-f]{24}", key):
+        abort(404)
+    path = wait_for_mind_map(key)
+    if path is None:
+        # Still rendering (or evicted): a placeholder that the browser must not cache
+        increment("fallbacks", kind="mind_map_placeholder")
+        return PLACEHOLDER_SVG, 200, {"Content-Type": "image/svg+xml", "Cache-Control": "no-store"}
+    return send_file(os.path.abspath(path), max_age=31536000)  # Content-addressed, so never stale
+
+@app.route('/api/ingestion/<job_id>')
+def ingestion_status(job_id):
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+        abort(404)
+    job = ingestion_queue().status(job_id)
+    if job is None:
+        return jsonify({"error": f"No ingestion job '{job_id}'"}), 404
+    return jsonify(job)
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
@@ -0,0 +1,276 @@
+# benchmark.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+CORPUS_SIZES = {"small": 6, "medium": 24, "large": 60}  # Documents per corpus, split across PDF/DOCX/TXT
+PAGES_PER_DOCUMENT = 3
+WORDS_PER_PAGE = 450
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR = 0.002  # Seconds; slowdowns smaller than this are never reported
+
+VOCABULARY = """
+neural network gradient descent learning rate backpropagation activation function loss
+convolutional layer pooling feature map recurrent sequence attention transformer encoder
+decoder embedding vector space cosine similarity cluster centroid regression classifier
+decision tree random forest support vector machine kernel margin regularization dropout
+overfitting validation training data batch normalization optimizer momentum weight bias
+probability distribution bayesian inference likelihood posterior prior sampling entropy
+""".split()
+
+def synthetic_text(rng, words):
+    sentences = []
+    while words > 0:
+        length = rng.randint(8, 18)
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(min(length, words)))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF, one string of text per page, readable by PyPDF2."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        words, lines, line = text.split(), [], []
+        for word in words:
+            line.append(word)
+            if len(line) == 12:
+                lines.append(" ".join(line))
+                line = []
+        if line:
+            lines.append(" ".join(line))
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(l)}) Tj T*" for l in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {len(objects)} 0 R /Resources << /Font << /F1 3 0 R >> >> >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_corpus(directory, documents, seed=0):
+    """Write `documents` synthetic files to `directory`, cycling through TXT, DOCX and PDF."""
+    from docx import Document
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i in range(documents):
+        pages = [synthetic_text(rng, WORDS_PER_PAGE) for _ in range(PAGES_PER_DOCUMENT)]
+        kind = ("txt", "docx", "pdf")[i % 3]
+        path = os.path.join(directory, f"doc_{i:03d}.{kind}")
+        if kind == "txt":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(pages))
+        elif kind == "docx":
+            doc = Document()
+            for page in pages:
+                doc.add_paragraph(page)
+            doc.save(path)
+        else:
+            write_pdf(path, pages)
+    return directory
+
+def summarize(times):
+    return {
+        "runs": len(times),
+        "min_s": round(min(times), 6),
+        "median_s": round(statistics.median(times), 6),
+        "mean_s": round(statistics.fmean(times), 6),
+        "max_s": round(max(times), 6),
+    }
+
+class BenchmarkRunner:
+    """Times callables over several runs, optionally re-running an untimed setup before each.
+
+    Results are reported to `out`, which stays the real stdout while the app's own output
+    is silenced.
+    """
+
+    def __init__(self, repeat=3, only=None, out=None):
+        self.repeat = repeat
+        self.only = only
+        self.out = out or sys.stdout
+        self.results = {}
+
+    def run(self, name, fn, setup=None, repeat=None):
+        if self.only and not any(name.startswith(prefix) for prefix in self.only):
+            return None
+        times = []
+        for _ in range(repeat or self.repeat):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            fn(*args)
+            times.append(time.perf_counter() - start)
+        self.results[name] = summarize(times)
+        print(f"{name:<44} median {self.results[name]['median_s'] * 1000:>10.2f}ms  (min {self.results[name]['min_s'] * 1000:.2f}ms)", file=self.out, flush=True)
+        return self.results[name]
+
+def run_benchmarks(runner, workdir, sizes):
+    # Imported here so the environment set up in main() is in place first
+    from fakes import FakeChatModel, FakeEmbeddingModel, fake_search_provider
+    from content_processing import process_documents, process_documents_incremental, build_knowledge_graph, corpus_knowledge_graph
+    from content_store import ContentStore, StoredContent
+    from vector_index import VectorIndex, chunk_text
+    from learning_assessment import (
+        extract_key_concepts, generate_questions_from_concepts, iter_question_matches,
+        update_user_profile, record_progress_bulk, progress_summary, search_web,
+    )
+    from question_bank import serve_questions, bank_questions, corpus_version
+    from mind_map import render_mind_map_svg, render_mind_map
+    from resource_search import set_search_provider
+
+    embedding_model = FakeEmbeddingModel()
+    llm = FakeChatModel()
+    set_search_provider(fake_search_provider())
+
+    # Document ingestion on corpora of increasing size
+    for size in sizes:
+        directory = write_corpus(os.path.join(workdir, "corpus", size), CORPUS_SIZES[size])
+        runner.run(f"process_documents/{size}", lambda d=directory: process_documents(d, workers=1))
+        counter = iter(range(1 << 30))
+
+        def fresh_store(size=size):
+            n = next(counter)
+            return (ContentStore(os.path.join(workdir, f"store_{size}_{n}.db")), VectorIndex(os.path.join(workdir, f"index_{size}_{n}")))
+        runner.run(
+            f"ingest_incremental_cold/{size}",
+            lambda store, index, d=directory: process_documents_incremental(d, store=store, index=index, embedding_model=embedding_model),
+            setup=fresh_store,
+        )
+        store, index = fresh_store()
+        process_documents_incremental(directory, store=store, index=index, embedding_model=embedding_model)
+        runner.run(
+            f"ingest_incremental_warm/{size}",
+            lambda d=directory: process_documents_incremental(d, store=store, index=index, embedding_model=embedding_model),
+        )
+        content = StoredContent(store)
+        runner.run(f"extract_key_concepts/{size}", lambda c=content: extract_key_concepts(c, "neural network training", embedding_model))
+        texts = {name: content[name] for name in content}
+        runner.run(f"extract_key_concepts_from_text/{size}", lambda t=texts: extract_key_concepts(t, "neural network training", embedding_model))
+        runner.run(f"vector_search/{size}", lambda i=index: i.search(embedding_model.embed_query("gradient descent"), k=5))
+        runner.run(f"chunk_text/{size}", lambda c=content: [chunk_text(c[name]) for name in c])
+        runner.run(f"knowledge_graph/{size}", lambda c=content: [build_knowledge_graph(c[name]) for name in c])
+        runner.run(f"corpus_graph/{size}", lambda s=store: corpus_knowledge_graph(s).to_networkx())
+
+    # Question generation and parsing against the fake model
+    concepts = ["gradient descent", "attention", "dropout", "kernel margin", "entropy"]
+    runner.run("generate_questions/2", lambda: generate_questions_from_concepts(llm, concepts, "machine learning", 0, num_questions=2))
+    runner.run("generate_questions/20", lambda: generate_questions_from_concepts(llm, concepts, "machine learning", 60, num_questions=20))
+    prompt = f"generate 200 questions about the following concepts: {', '.join(concepts)}. Each question"
+    chunks = [c.content for c in llm.stream(prompt)]
+    runner.run("parse_question_stream/200", lambda: sum(1 for _ in iter_question_matches(iter(chunks))))
+
+    # Mind maps
+    runner.run("mind_map_svg", lambda: render_mind_map_svg("machine learning", concepts))
+    render_mind_map("machine learning", concepts)
+    runner.run("mind_map_cached", lambda: render_mind_map("machine learning", concepts))
+
+    # Database paths
+    names = iter(range(1 << 30))
+    runner.run("db_update_user_profile", lambda: update_user_profile(f"user{next(names)}", "V", "machine learning", 50, 80))
+    rows = [{"name": f"bulk{i % 50}", "learning_style": "R", "topic": f"topic{i % 20}", "score": i % 100, "phase": "baseline"} for i in range(1000)]
+    runner.run("db_record_progress_bulk/1000", lambda: record_progress_bulk(rows))
+    record_progress_bulk([dict(r, name="heavy") for r in rows] * 5)
+    runner.run("db_progress_summary/5000", lambda: progress_summary("heavy", page=1, per_page=20))
+    content = StoredContent(ContentStore(os.path.join(workdir, "bank_store.db")))
+    bank_questions(generate_questions_from_concepts(llm, concepts, "banked", 0, num_questions=40)[0], "banked", concepts, "basic", corpus_version(content))
+    runner.run("db_serve_questions_banked", lambda: serve_questions(llm, concepts, "banked", 0, num_questions=2, content=content))
+
+    # Resource search through the cache
+    runner.run("search_web_cached", lambda: search_web("machine learning", "V", llm))
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Print how each median compares with the baseline; returns the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':<44} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in sorted(results.items()):
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            print(f"{name:<44} {'-':>12} {result['median_s'] * 1000:>10.2f}ms {'new':>8}")
+            continue
+        before, now = previous["median_s"], result["median_s"]
+        change = (now - before) / before if before else 0.0
+        regressed = change > tolerance and now - before > NOISE_FLOOR
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<44} {before * 1000:>10.2f}ms {now * 1000:>10.2f}ms {change:>+7.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Personalized Learning Companion")
+    parser.add_argument("--sizes", default="small,medium", help=f"Corpus sizes to run, from {', '.join(CORPUS_SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--only", help="Comma-separated benchmark name prefixes to run")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results previously saved with --output")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown before a benchmark counts as a regression")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own output while benchmarking")
+    args = parser.parse_args(argv)
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in CORPUS_SIZES]
+    if unknown:
+        parser.error(f"unknown corpus sizes: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix="learning-companion-bench-") as workdir:
+        # Keep every store the app opens inside the scratch directory
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "CONTENT_STORE_PATH": os.path.join(workdir, "content_store.db"),
+            "VECTOR_INDEX_DIR": os.path.join(workdir, "vector_index"),
+            "EMBEDDING_CACHE_PATH": "",
+            "MIND_MAP_DIR": os.path.join(workdir, "mind_maps"),
+            "SEARCH_PROVIDER": "local",
+            "DOCUMENT_WORKERS": "1",
+            # Repeated runs send identical prompts; without this they'd time the single-flight cache
+            "LLM_COALESCE_TTL": "0",
+        })
+        runner = BenchmarkRunner(repeat=args.repeat, only=args.only.split(",") if args.only else None)
+        start_time = time.time()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            run_benchmarks(runner, workdir, sizes)
+        print(f"Benchmarks completed (took {time.time() - start_time:.2f}s)")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "repeat": args.repeat,
+        "results": runner.results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(runner.results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# concept_extraction.py
+import heapq
+import itertools
+import math
+import re
+from collections import Counter, deque
+
+# Words, plus punctuation that ends a phrase (yielded so n-grams never span it)
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|[.!?;:,()\[\]]")
+WHITESPACE = re.compile(r"\s")
+
+STOP_WORDS = frozenset("""
+a about above after again against all almost also although always am among an and another any are
+around as at be became because become been before being below between both but by can cannot could
+did do does doing done down during each either else enough etc even ever every few for from further
+get gets given gives go had has have having he her here hers herself him himself his how however i if
+in into is it its itself just least less like made make makes many may me might more most much must
+my myself near need neither never next no nor not now of off often on once one only onto or other
+others otherwise our ours ourselves out over own per perhaps rather same see seen several shall she
+should show shown since so some such than that the their theirs them themselves then there these they
+this those though through thus to too toward under until up upon us use used uses using very via was
+we well were what whatever when where whether which while who whom whose why will with within without
+would yet you your yours yourself yourselves
+chapter section figure table page pages example examples editors published university handbook
+borko furht armando escalante science florida themoore penrosepseudoinverse termmemoryandothergatedrnns
+""".split())
+
+def iter_tokens(text, chunk_chars=1 << 20):
+    """Yield lowercase word and phrase-break tokens, lowercasing one bounded slice at a time."""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            # Extend to the next whitespace so no word is split across slices
+            space = WHITESPACE.search(text, end)
+            end = space.start() if space else length
+        yield from TOKEN_PATTERN.findall(text[start:end].lower())
+        start = end
+
+def document_ngram_counts(text, max_n=3, min_length=3, stop_words=STOP_WORDS, max_terms=5000):
+    """Count unigrams to `max_n`-grams in one document in memory bounded by `max_terms`.
+
+    Stop words, short tokens and punctuation break phrases: an n-gram is kept only if
+    every token in it is a content word. Tokens are streamed and n-grams counted as they
+    complete. Whenever more than 2 * `max_terms` phrases are held the counter is pruned
+    back to its `max_terms` most frequent, so memory stays flat however long the document
+    is. Documents with up to 2 * `max_terms` distinct phrases are counted exactly and kept
+    whole, so their phrases all count towards document frequencies; longer documents lose
+    only their rarest ones.
+    """
+    counts = Counter()
+    window = deque(maxlen=max_n)
+    for token in iter_tokens(text):
+        if len(token) < min_length or token in stop_words:
+            window.clear()
+            continue
+        window.append(token)
+        for n in range(1, len(window) + 1):
+            counts[" ".join(itertools.islice(window, len(window) - n, None))] += 1
+        if max_terms and len(counts) > 2 * max_terms:
+            counts = Counter(dict(counts.most_common(max_terms)))
+    return counts
+
+def merge_document_counts(doc_counts):
+    """Merge per-document counters into corpus term frequencies and document frequencies."""
+    term_freq = Counter()
+    doc_freq = Counter()
+    num_docs = 0
+    for counts in doc_counts:
+        num_docs += 1
+        term_freq.update(counts)
+        doc_freq.update(counts.keys())
+    return term_freq, doc_freq, num_docs
+
+def score_candidates(term_freq, doc_freq, num_docs, min_count=2):
+    """TF-IDF score per phrase: sublinear corpus frequency times smoothed inverse document frequency.
+
+    Longer phrases get a mild boost, as they name concepts more specifically than single words.
+    Phrases seen fewer than `min_count` times are dropped unless nothing else remains.
+    """
+    kept = {t: c for t, c in term_freq.items() if c >= min_count} or dict(term_freq)
+    scores = {}
+    for term, count in kept.items():
+        idf = math.log((1 + num_docs) / (1 + doc_freq[term])) + 1.0
+        length_boost = 1.0 + 0.5 * (term.count(" "))
+        scores[term] = (1.0 + math.log(count)) * idf * length_boost
+    return scores
+
+def rank_candidates(term_freq, doc_freq, num_docs, max_candidates=100):
+    """The `max_candidates` best phrases by score_candidates, best first."""
+    scores = score_candidates(term_freq, doc_freq, num_docs)
+    return [t for t, _ in heapq.nsmallest(max_candidates, scores.items(), key=lambda x: (-x[1], x[0]))]
+
+def extract_candidates(content, max_candidates=100, max_n=3):
+    """Rank concept candidates across the whole corpus, best first.
+
+    `content` maps document names to text; documents are read one at a time, so lazy
+    mappings such as StoredContent never hold more than one text in memory. Content
+    with precomputed phrase tables (StoredContent.ranked_phrases) is ranked from those
+    without reading any text.
+    """
+    ranked_phrases = getattr(content, "ranked_phrases", None)
+    if ranked_phrases is not None and max_n == 3:  # Stored tables hold up to trigrams
+        return ranked_phrases(max_candidates)
+    return rank_candidates(*merge_document_counts(
+        document_ngram_counts(content[name], max_n=max_n) for name in content
+    ), max_candidates)
@@ -1,44 +1,186 @@
 # content_processing.py (unchanged from your latest working version, just confirming)
 import os
-from PyPDF2 import PdfReader
-from docx import Document
-import networkx as nx
-from collections import Counter
+import hashlib
+import signal
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from content_store import get_content_store, StoredContent, StoredGraphs
+from knowledge_graph import CooccurrenceGraph
+from concept_extraction import document_ngram_counts
+from metrics import observe, increment
 
-def extract_text_from_pdf(file_path):
-    """Extract text from a PDF file."""
-    try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text.strip()
-    except Exception as e:
-        print(f"Error processing PDF {file_path}: {e}")
-        return ""
+TXT_CHUNK_SIZE = 1 << 16
+
+def iter_pdf_chunks(file_path, pages=None):
+    """Yield the text of each PDF page, optionally limited to a (start, stop) page range."""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    total = len(reader.pages)
+    start, stop = pages if pages else (0, total)
+    for i in range(max(start, 0), min(stop, total)):
+        yield reader.pages[i].extract_text() or ""
+
+def iter_docx_chunks(file_path, pages=None):
+    """Yield non-empty DOCX paragraphs, newline-separated. DOCX has no pages, so `pages` is ignored."""
+    from docx import Document
+    doc = Document(file_path)
+    first = True
+    for para in doc.paragraphs:
+        if para.text:
+            yield para.text if first else "\n" + para.text
+            first = False
+
+def iter_txt_chunks(file_path, pages=None, chunk_size=TXT_CHUNK_SIZE):
+    """Yield a TXT file in blocks of about `chunk_size` characters. `pages` is ignored.
+    
+    Each block ends on whitespace: a word cut by the block boundary is carried into the
+    next block, so consumers that split chunks into words never see half a word.
+    """
+    carry = ""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(chunk_size), ""):
+            block = carry + block
+            split = len(block)
+            while split and not block[split - 1].isspace():
+                split -= 1
+            if not split:  # No whitespace at all; keep reading
+                carry = block
+                continue
+            carry = block[split:]
+            yield block[:split]
+    if carry:
+        yield carry
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+CHUNK_READERS = {".pdf": iter_pdf_chunks, ".docx": iter_docx_chunks, ".txt": iter_txt_chunks}
+
+def iter_text_chunks(file_path, pages=None, max_bytes=None):
+    """Stream a document as (offset, chunk) pairs without materializing the whole text.
+    
+    Offsets are character positions in the concatenation of all chunks. Reading stops
+    once `max_bytes` of UTF-8 text have been produced, truncating the last chunk.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    offset = 0
+    used = 0
+    for chunk in CHUNK_READERS[ext](file_path, pages=pages):
+        if not chunk:
+            continue
+        if max_bytes is not None:
+            encoded = chunk.encode("utf-8")
+            if used + len(encoded) >= max_bytes:
+                chunk = encoded[:max_bytes - used].decode("utf-8", errors="ignore")
+                if chunk:
+                    yield offset, chunk
+                return
+            used += len(encoded)
+        yield offset, chunk
+        offset += len(chunk)
 
-def extract_text_from_docx(file_path):
-    """Extract text from a DOCX file."""
+def extract_text(file_path, pages=None, max_bytes=None):
+    """Extract text from any supported file, joining its chunks once."""
+    return "".join(chunk for _, chunk in iter_text_chunks(file_path, pages=pages, max_bytes=max_bytes)).strip()
+
+def extract_document(file_path, pages=None, max_bytes=None):
+    """Extract text from a supported file, logging and swallowing per-format errors (not timeouts)."""
     try:
-        doc = Document(file_path)
-        text = "\n".join([para.text for para in doc.paragraphs if para.text])
-        return text.strip()
+        return extract_text(file_path, pages=pages, max_bytes=max_bytes)
+    except TimeoutError:  # Raised by process_file's alarm; the caller reports it
+        raise
     except Exception as e:
-        print(f"Error processing DOCX {file_path}: {e}")
+        print(f"Error processing {os.path.splitext(file_path)[1][1:].upper()} {file_path}: {e}")
         return ""
 
-def extract_text_from_txt(file_path):
-    """Extract text from a TXT file."""
+def list_documents(directory):
+    """Sorted names of the supported files in directory."""
+    return sorted(
+        f for f in os.listdir(directory)
+        if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS and os.path.isfile(os.path.join(directory, f))
+    )
+
+def _alarm_available():
+    """Whether process_file can enforce its timeout here (SIGALRM, on the main thread)."""
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+def _timeout_handler(signum, frame):
+    raise TimeoutError("document processing timed out")
+
+def process_file(file_path, timeout=None):
+    """Extract text, build the knowledge graph and count candidate phrases for one file.
+    
+    Returns (text, graph, phrases, error). Failures are reported through `error` rather than
+    raised, so one bad file cannot take down a batch. `timeout` (seconds) is enforced
+    with SIGALRM and therefore only applies on a process's main thread; process_files
+    runs files in a worker process when it is called from any other thread.
+    """
+    use_alarm = bool(timeout) and _alarm_available()
+    if timeout and not use_alarm:
+        print(f"⚠️ Document timeout not enforced for {file_path}: SIGALRM is unavailable here")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _timeout_handler)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read().strip()
+        text = extract_document(file_path)
+        graph = build_knowledge_graph(text) if text else None
+        phrases = document_ngram_counts(text) if text else None
+        return text, graph, phrases, None
     except Exception as e:
-        print(f"Error processing TXT {file_path}: {e}")
-        return ""
+        return "", None, None, f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+def _process_file_timed(file_path, timeout=None):
+    """process_file plus its duration, measured where it runs so pool workers report it too."""
+    start = time.perf_counter()
+    result = process_file(file_path, timeout)
+    return result, time.perf_counter() - start
+
+def default_workers():
+    """Worker count from DOCUMENT_WORKERS, defaulting to 1 (serial)."""
+    return int(os.getenv("DOCUMENT_WORKERS", "1"))
+
+def process_files(file_paths, workers=None, timeout=None, on_result=None):
+    """Run process_file over file_paths, fanning out to a process pool when workers > 1.
+    
+    Returns {file_path: (text, graph, phrases, error)} with one entry per input path.
+    `on_result(file_path, result)` is called as each file finishes, in completion order.
+    With a `timeout`, files are always processed in worker processes when called off the
+    main thread (e.g. from the ingestion queue), since the alarm only works on a main thread.
+    """
+    workers = default_workers() if workers is None else workers
+    if timeout is None and os.getenv("DOCUMENT_TIMEOUT"):
+        timeout = float(os.getenv("DOCUMENT_TIMEOUT"))
+    file_paths = list(file_paths)
+    results = {}
+    # Off the main thread the alarm can't be set, but a pool worker's main thread can set it
+    isolate = bool(timeout) and hasattr(signal, "SIGALRM") and not _alarm_available()
+    if not file_paths or (not isolate and (workers <= 1 or len(file_paths) <= 1)):
+        for path in file_paths:
+            results[path], seconds = _process_file_timed(path, timeout)
+            observe("document_extraction", seconds)
+            if on_result:
+                on_result(path, results[path])
+    else:
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(file_paths)))) as executor:
+            futures = {executor.submit(_process_file_timed, path, timeout): path for path in file_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path], seconds = future.result()
+                    observe("document_extraction", seconds)
+                except Exception as e:  # Worker died, e.g. BrokenProcessPool
+                    results[path] = ("", None, None, f"{type(e).__name__}: {e}")
+                if on_result:
+                    on_result(path, results[path])
+    increment("errors", sum(1 for *_, error in results.values() if error), operation="document_extraction")
+    return results
 
-def process_documents(directory="data/raw"):
+def process_documents(directory="data/raw", workers=None, timeout=None):
     """Process all supported files in the directory and build knowledge graphs."""
-    supported_extensions = {".pdf", ".docx", ".txt"}
     extracted_content = {}
     knowledge_graphs = {}
     
@@ -47,44 +189,173 @@ def process_documents(directory="data/raw"):
         os.makedirs(directory)
         return extracted_content, knowledge_graphs
     
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        ext = os.path.splitext(filename)[1].lower()
-        
-        if ext in supported_extensions:
-            print(f"Processing {filename}...")
-            if ext == ".pdf":
-                text = extract_text_from_pdf(file_path)
-            elif ext == ".docx":
-                text = extract_text_from_docx(file_path)
-            elif ext == ".txt":
-                text = extract_text_from_txt(file_path)
-            
-            if text:
-                extracted_content[filename] = text
-                knowledge_graphs[filename] = build_knowledge_graph(text)
-                print(f"✅ Processed {filename}: {len(text)} chars, {knowledge_graphs[filename].number_of_nodes()} nodes")
-            else:
-                print(f"❌ No content extracted from {filename}")
+    filenames = list_documents(directory)
+    results = process_files([os.path.join(directory, f) for f in filenames], workers=workers, timeout=timeout)
+    for filename in filenames:
+        text, graph, _, error = results[os.path.join(directory, filename)]
+        if text:
+            extracted_content[filename] = text
+            knowledge_graphs[filename] = graph
+            print(f"✅ Processed {filename}: {len(text)} chars, {graph.number_of_nodes()} nodes")
+        elif error:
+            print(f"❌ Failed to process {filename}: {error}")
+        else:
+            print(f"❌ No content extracted from {filename}")
     
     return extracted_content, knowledge_graphs
 
-def build_knowledge_graph(text, max_nodes=10):
-    """Create a simple knowledge graph from text."""
-    words = [word.lower() for word in text.split() if len(word) > 3 and word.isalpha()]
-    common_words = [word for word, count in Counter(words).most_common(max_nodes)]
+def file_sha256(file_path, chunk_size=1 << 20):
+    """Hex SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def process_documents_incremental(directory="data/raw", store=None, force=False, workers=None, timeout=None, index=None, embedding_model=None, progress=None):
+    """Bring the content store in line with `directory`, processing only added or changed files.
+    
+    The store keeps each file's size, mtime and SHA-256. Files whose size and mtime are
+    unchanged are reused without hashing; otherwise the file is hashed, and a stored
+    document with the same hash is reused if present. Deleted files are dropped. Files
+    that fail are left out of the store so they are retried on the next call.
+    Each document's candidate phrase counts are stored with it; documents stored before
+    phrase tables existed are counted from their stored text. When a vector index and
+    embedding model are given, new and changed documents are chunked and embedded into
+    the index, and their most frequent phrases are embedded as well.
+    `progress(filename, status, error=None)` is told about each file as it goes:
+    "reused", "processing", then "processed" or "failed".
+    Returns (extracted_content, knowledge_graphs, stats), where the first two are lazy
+    views that load a document's text or graph only when it is accessed.
+    """
+    store = store or get_content_store()
+    if not os.path.exists(directory):
+        print(f"Directory {directory} not found. Creating it...")
+        os.makedirs(directory)
+    manifest = store.manifest()
+    stats = {"reused": 0, "processed": 0, "failed": 0, "removed": 0}
+    report = progress or (lambda filename, status, error=None: None)
+    
+    pending = {}
+    for filename in list_documents(directory):
+        file_path = os.path.join(directory, filename)
+        st = os.stat(file_path)
+        meta = {"size": st.st_size, "mtime": st.st_mtime}
+        entry = manifest.get(filename)
+        if not force and entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            stats["reused"] += 1
+            report(filename, "reused")
+            continue
+        meta["sha256"] = file_sha256(file_path)
+        if not force and entry and entry["sha256"] == meta["sha256"]:
+            store.update_stat(filename, meta)
+            stats["reused"] += 1
+            report(filename, "reused")
+            continue
+        source = None if force else store.find_by_sha256(meta["sha256"])
+        if source is not None:
+            store.copy_document(source, filename, meta)
+            stats["reused"] += 1
+            report(filename, "reused")
+            continue
+        pending[filename] = meta
     
-    G = nx.Graph()
-    for i, word in enumerate(common_words):
-        G.add_node(word)
-        if i > 0:
-            G.add_edge(common_words[i-1], word)
+    for filename in pending:
+        print(f"Processing {filename}...")
+        report(filename, "processing")
     
-    return G
+    def store_result(file_path, result):
+        filename = os.path.basename(file_path)
+        text, graph, phrases, error = result
+        if error:
+            print(f"❌ Failed to process {filename}: {error}")
+            stats["failed"] += 1
+            store.remove_documents([filename])
+            report(filename, "failed", error)
+            return
+        store.put_document(filename, pending[filename], text, graph, phrases)
+        stats["processed"] += 1
+        if text:
+            print(f"✅ Processed {filename}: {len(text)} chars, {graph.number_of_nodes()} nodes")
+        else:
+            print(f"❌ No content extracted from {filename}")
+        report(filename, "processed")
+    process_files([os.path.join(directory, f) for f in pending], workers=workers, timeout=timeout, on_result=store_result)
+    
+    removed = set(manifest) - set(list_documents(directory))
+    store.remove_documents(removed)
+    stats["removed"] = len(removed)
+    for filename in store.documents_without_phrases():
+        store.put_phrases(filename, document_ngram_counts(store.get_text(filename)))
+    content = StoredContent(store)
+    content.ranked_phrases()  # Merge the phrase tables now so the first quiz start only looks them up
+    if index is not None and embedding_model is not None:
+        stats["indexed"] = index.sync(content, store.versions(), embedding_model)
+        stats["phrases_embedded"] = embed_document_phrases(store, embedding_model, content)
+    return content, StoredGraphs(store), stats
+
+PHRASES_EMBEDDED_PER_DOCUMENT = 300
+
+def embedding_model_name(embedding_model):
+    return getattr(embedding_model, "model_name", getattr(embedding_model, "model", type(embedding_model).__name__))
+
+def phrase_embeddings(store, phrases, embedding_model):
+    """(len(phrases), d) matrix of phrase embeddings, computing and storing any that are missing."""
+    model = embedding_model_name(embedding_model)
+    vectors = store.get_phrase_vectors(model, phrases)
+    missing = [p for p in dict.fromkeys(phrases) if p not in vectors]
+    if missing:
+        fresh = list(zip(missing, embedding_model.embed_documents(missing)))
+        store.put_phrase_vectors(model, fresh)
+        vectors.update(fresh)
+    return np.vstack([np.asarray(vectors[p], dtype=np.float32) for p in phrases])
+
+def embed_document_phrases(store, embedding_model, filenames, per_document=PHRASES_EMBEDDED_PER_DOCUMENT):
+    """Embed the `per_document` most frequent phrases of each document ahead of quiz time.
+
+    Phrases already embedded with this model are skipped; returns how many were embedded.
+    """
+    model = embedding_model_name(embedding_model)
+    phrases = list(dict.fromkeys(p for filename in filenames for p in store.top_phrases(filename, per_document)))
+    stored = store.get_phrase_vectors(model, phrases)
+    missing = [p for p in phrases if p not in stored]
+    if missing:
+        phrase_embeddings(store, missing, embedding_model)
+    return len(missing)
+
+GRAPH_WINDOW = 5
+GRAPH_MAX_NODES = 200
+GRAPH_TOP_K = 10
+
+def build_knowledge_graph(text, max_nodes=GRAPH_MAX_NODES, top_k=GRAPH_TOP_K, window=GRAPH_WINDOW):
+    """Create a co-occurrence knowledge graph from text (see build_knowledge_graph_from_chunks)."""
+    return build_knowledge_graph_from_chunks([text], max_nodes=max_nodes, top_k=top_k, window=window)
+
+def build_knowledge_graph_from_chunks(chunks, max_nodes=GRAPH_MAX_NODES, top_k=GRAPH_TOP_K, window=GRAPH_WINDOW):
+    """Build a document's co-occurrence graph from streamed text chunks.
+    
+    Content words within `window` words of each other in a sentence are linked, and
+    edges are weighted by PMI. The result keeps the `max_nodes` most frequent words and
+    each word's `top_k` strongest edges, with raw counts so documents can be merged
+    into a corpus graph; call .to_networkx() for a networkx graph.
+    """
+    graph = CooccurrenceGraph(window=window).add_chunks(chunks)
+    return graph.pruned(max_nodes=max_nodes, top_k=top_k)
+
+def corpus_knowledge_graph(store=None, filenames=None, window=GRAPH_WINDOW):
+    """Merge the stored per-document graphs into one corpus-level CooccurrenceGraph, one document at a time."""
+    store = store or get_content_store()
+    graph = CooccurrenceGraph(window=window)
+    for filename in (filenames if filenames is not None else store.document_names()):
+        document_graph = store.get_cooccurrence(filename)
+        if document_graph is not None:
+            graph.merge(document_graph)
+    return graph
 
 if __name__ == "__main__":
     content, graphs = process_documents()
     for filename, graph in graphs.items():
         print(f"\nKnowledge graph for {filename}:")
-        print(f"Nodes: {list(graph.nodes)}")
-        print(f"Edges: {list(graph.edges)}")
\ No newline at end of file
+        G = graph.to_networkx()
+        print(f"Nodes: {list(G.nodes)}")
+        print(f"Edges: {list(G.edges)}")
\ No newline at end of file
@@ -0,0 +1,367 @@
+# content_store.py
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from collections.abc import Mapping
+import numpy as np
+
+DEFAULT_STORE_PATH = "data/content_store.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    filename TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    char_count INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_documents_sha256 ON documents(sha256);
+CREATE TABLE IF NOT EXISTS graph_nodes (
+    filename TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    node TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (filename, position)
+);
+CREATE TABLE IF NOT EXISTS graph_edges (
+    filename TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    weight REAL NOT NULL DEFAULT 1.0,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_graph_edges_filename ON graph_edges(filename);
+CREATE TABLE IF NOT EXISTS graph_totals (
+    filename TEXT PRIMARY KEY,
+    window INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    pairs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_phrases (
+    filename TEXT NOT NULL,
+    phrase TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (filename, phrase)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS phrase_vectors (
+    model TEXT NOT NULL,
+    phrase TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model, phrase)
+) WITHOUT ROWID;
+"""
+
+class ContentStore:
+    """SQLite store of processed documents, their metadata and knowledge graph edges.
+
+    Every document is a separate row, so texts and graphs can be loaded one at a time
+    and listing the corpus or checking it for changes never reads document bodies.
+    Each document also has a table of candidate concept phrases with their counts, and
+    phrase embeddings are kept per model, so concept extraction never re-reads texts.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped on every write, to invalidate _memo
+        self._memo = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _migrate(self):
+        """Drop documents stored with the old word-chain graphs (no counts) so they are reprocessed."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(graph_nodes)")]
+        if columns and "count" not in columns:
+            print("Content store predates co-occurrence graphs; documents will be reprocessed.")
+            self._conn.executescript("DROP TABLE graph_nodes; DROP TABLE graph_edges; DELETE FROM documents;")
+
+    def manifest(self):
+        """{filename: {"size", "mtime", "sha256"}} for every stored document."""
+        with self._lock:
+            rows = self._conn.execute("SELECT filename, size, mtime, sha256 FROM documents").fetchall()
+        return {f: {"size": size, "mtime": mtime, "sha256": sha} for f, size, mtime, sha in rows}
+
+    def document_names(self):
+        """Names of stored documents with non-empty text, sorted."""
+        with self._lock:
+            rows = self._conn.execute("SELECT filename FROM documents WHERE char_count > 0 ORDER BY filename").fetchall()
+        return [r[0] for r in rows]
+
+    def versions(self):
+        """{filename: sha256} for stored documents with non-empty text."""
+        with self._lock:
+            rows = self._conn.execute("SELECT filename, sha256 FROM documents WHERE char_count > 0").fetchall()
+        return dict(rows)
+
+    def metadata(self, filename):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, sha256, char_count FROM documents WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"size": row[0], "mtime": row[1], "sha256": row[2], "char_count": row[3]}
+
+    def get_text(self, filename):
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM documents WHERE filename = ?", (filename,)).fetchone()
+        return row[0] if row else None
+
+    def get_cooccurrence(self, filename):
+        """Rebuild one document's CooccurrenceGraph from its stored counts; None if it has no graph."""
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT window, tokens, pairs FROM graph_totals WHERE filename = ?", (filename,)
+            ).fetchone()
+            if totals is None:
+                return None
+            nodes = self._conn.execute(
+                "SELECT node, count FROM graph_nodes WHERE filename = ? ORDER BY position", (filename,)
+            ).fetchall()
+            edges = self._conn.execute(
+                "SELECT source, target, count FROM graph_edges WHERE filename = ?", (filename,)
+            ).fetchall()
+        from knowledge_graph import CooccurrenceGraph
+        window, tokens, pairs = totals
+        return CooccurrenceGraph.from_rows(nodes, edges, tokens, pairs, window=window)
+
+    def get_graph(self, filename):
+        """Build the networkx graph for one document from its stored nodes and edges."""
+        with self._lock:
+            nodes = self._conn.execute(
+                "SELECT node, count FROM graph_nodes WHERE filename = ? ORDER BY position", (filename,)
+            ).fetchall()
+            edges = self._conn.execute(
+                "SELECT source, target, weight, count FROM graph_edges WHERE filename = ? ORDER BY rowid", (filename,)
+            ).fetchall()
+        import networkx as nx
+        G = nx.Graph()
+        G.add_nodes_from((n, {"count": c}) for n, c in nodes)
+        G.add_edges_from((u, v, {"weight": w, "count": c}) for u, v, w, c in edges)
+        return G
+
+    def _cache_version(self):
+        """Changes whenever this store or another connection to its file commits a write."""
+        return self._generation, self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def memoized(self, key, compute):
+        """compute(), cached under `key` until the store changes."""
+        with self._lock:
+            version = self._cache_version()
+            cached = self._memo.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = compute()
+        with self._lock:
+            self._memo = {k: v for k, v in self._memo.items() if v[0] == version}
+            self._memo[key] = (version, value)
+        return value
+
+    def phrase_frequencies(self, filenames=None):
+        """(term_freq, doc_freq, num_docs) merged from the phrase tables of `filenames` (all documents by default)."""
+        key = None if filenames is None else sorted(filenames)
+        with self._lock:
+            if key is None:
+                rows = self._conn.execute(
+                    "SELECT phrase, SUM(count), COUNT(*) FROM document_phrases GROUP BY phrase"
+                ).fetchall()
+                num_docs = self._conn.execute("SELECT COUNT(*) FROM documents WHERE char_count > 0").fetchone()[0]
+            else:
+                rows = self._conn.execute(
+                    "SELECT phrase, SUM(count), COUNT(*) FROM document_phrases "
+                    "WHERE filename IN (SELECT value FROM json_each(?)) GROUP BY phrase",
+                    (json.dumps(key),),
+                ).fetchall()
+                num_docs = len(key)
+        return Counter({p: c for p, c, _ in rows}), Counter({p: d for p, _, d in rows}), num_docs
+
+    def put_phrases(self, filename, counts):
+        """Replace the candidate phrase table ({phrase: count}) of a stored document."""
+        with self._lock:
+            self._conn.execute("DELETE FROM document_phrases WHERE filename = ?", (filename,))
+            self._conn.executemany(
+                "INSERT INTO document_phrases VALUES (?, ?, ?)", [(filename, p, c) for p, c in counts.items()]
+            )
+            self._generation += 1
+            self._conn.commit()
+
+    def top_phrases(self, filename, limit):
+        """The `limit` most frequent phrases of one document."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phrase FROM document_phrases WHERE filename = ? ORDER BY count DESC, phrase LIMIT ?",
+                (filename, limit),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def documents_without_phrases(self):
+        """Stored documents with text but no phrase table, e.g. ones processed before phrase tables existed."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM documents WHERE char_count > 0 AND filename NOT IN "
+                "(SELECT DISTINCT filename FROM document_phrases) ORDER BY filename"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def get_phrase_vectors(self, model, phrases):
+        """{phrase: float32 vector} for the phrases embedded with `model`."""
+        if not phrases:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phrase, vector FROM phrase_vectors WHERE model = ? AND phrase IN (SELECT value FROM json_each(?))",
+                (model, json.dumps(list(phrases))),
+            ).fetchall()
+        return {p: np.frombuffer(v, dtype=np.float32) for p, v in rows}
+
+    def put_phrase_vectors(self, model, items):
+        """Store (phrase, vector) pairs embedded with `model`."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO phrase_vectors VALUES (?, ?, ?)",
+                [(model, p, np.asarray(v, dtype=np.float32).tobytes()) for p, v in items],
+            )
+            self._conn.commit()
+
+    def copy_document(self, source_filename, filename, meta):
+        """Store `filename` as a copy of an already processed document with identical content."""
+        with self._lock:
+            self._delete(filename)
+            self._conn.execute(
+                "INSERT INTO documents SELECT ?, sha256, ?, ?, char_count, text FROM documents WHERE filename = ?",
+                (filename, meta["size"], meta["mtime"], source_filename),
+            )
+            self._conn.execute(
+                "INSERT INTO graph_nodes SELECT ?, position, node, count FROM graph_nodes WHERE filename = ?",
+                (filename, source_filename),
+            )
+            self._conn.execute(
+                "INSERT INTO graph_edges SELECT ?, source, target, weight, count FROM graph_edges WHERE filename = ? ORDER BY rowid",
+                (filename, source_filename),
+            )
+            self._conn.execute(
+                "INSERT INTO graph_totals SELECT ?, window, tokens, pairs FROM graph_totals WHERE filename = ?",
+                (filename, source_filename),
+            )
+            self._conn.execute(
+                "INSERT INTO document_phrases SELECT ?, phrase, count FROM document_phrases WHERE filename = ?",
+                (filename, source_filename),
+            )
+            self._conn.commit()
+
+    def find_by_sha256(self, sha256):
+        with self._lock:
+            row = self._conn.execute("SELECT filename FROM documents WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def update_stat(self, filename, meta):
+        """Record a new size/mtime for a document whose content hash did not change."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET size = ?, mtime = ? WHERE filename = ?", (meta["size"], meta["mtime"], filename)
+            )
+            self._conn.commit()
+
+    def put_document(self, filename, meta, text, graph, phrases=None):
+        """Insert or replace a document together with its CooccurrenceGraph and phrase counts."""
+        with self._lock:
+            self._delete(filename)
+            self._conn.execute(
+                "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                (filename, meta["sha256"], meta["size"], meta["mtime"], len(text), text),
+            )
+            if graph is not None:
+                self._conn.executemany(
+                    "INSERT INTO graph_nodes VALUES (?, ?, ?, ?)",
+                    [(filename, i, node, count) for i, (node, count) in enumerate(graph.node_rows())],
+                )
+                self._conn.executemany(
+                    "INSERT INTO graph_edges VALUES (?, ?, ?, ?, ?)",
+                    [(filename, u, v, weight, count) for u, v, weight, count in graph.edge_rows()],
+                )
+                self._conn.execute(
+                    "INSERT INTO graph_totals VALUES (?, ?, ?, ?)",
+                    (filename, graph.window, graph.total_tokens, graph.total_pairs),
+                )
+            if phrases:
+                self._conn.executemany(
+                    "INSERT INTO document_phrases VALUES (?, ?, ?)", [(filename, p, c) for p, c in phrases.items()]
+                )
+            self._conn.commit()
+
+    def remove_documents(self, filenames):
+        with self._lock:
+            for filename in filenames:
+                self._delete(filename)
+            if filenames:
+                # Drop embeddings of phrases no remaining document uses
+                self._conn.execute(
+                    "DELETE FROM phrase_vectors WHERE phrase NOT IN (SELECT phrase FROM document_phrases)"
+                )
+            self._conn.commit()
+
+    def _delete(self, filename):
+        self._conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+        self._conn.execute("DELETE FROM graph_nodes WHERE filename = ?", (filename,))
+        self._conn.execute("DELETE FROM graph_edges WHERE filename = ?", (filename,))
+        self._conn.execute("DELETE FROM graph_totals WHERE filename = ?", (filename,))
+        self._conn.execute("DELETE FROM document_phrases WHERE filename = ?", (filename,))
+        self._generation += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class StoredContent(Mapping):
+    """Read-only {filename: text} view over a ContentStore that loads each text on access."""
+
+    def __init__(self, store, filenames=None):
+        self.store = store
+        self.filenames = list(filenames) if filenames is not None else store.document_names()
+        self._names = set(self.filenames)
+
+    def __getitem__(self, filename):
+        if filename not in self._names:
+            raise KeyError(filename)
+        return self.store.get_text(filename)
+
+    def __iter__(self):
+        return iter(self.filenames)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def ranked_phrases(self, max_candidates=100):
+        """Concept candidates ranked from the documents' precomputed phrase tables, cached until the store changes."""
+        from concept_extraction import rank_candidates
+        key = ("ranked_phrases", tuple(sorted(self.filenames)), max_candidates)
+        return self.store.memoized(key, lambda: rank_candidates(*self.store.phrase_frequencies(self.filenames), max_candidates))
+
+class StoredGraphs(StoredContent):
+    """Read-only {filename: graph} view over a ContentStore that rebuilds each graph on access."""
+
+    def __getitem__(self, filename):
+        if filename not in self._names:
+            raise KeyError(filename)
+        return self.store.get_graph(filename)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_content_store(path=None):
+    """Process-wide ContentStore for `path` (CONTENT_STORE_PATH or the default)."""
+    path = path or os.getenv("CONTENT_STORE_PATH", DEFAULT_STORE_PATH)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ContentStore(path)
+        return _stores[path]
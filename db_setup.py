@@ -1,8 +1,12 @@
 # db_setup.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Float, ForeignKey, DateTime, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import os
+import threading
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///learning_companion.db")
 
 Base = declarative_base()
 
@@ -21,12 +25,96 @@ class Progress(Base):
     score = Column(Float)
     phase = Column(String)
     last_updated = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    __table_args__ = (Index("ix_progress_user_subject_updated", "user_id", "subject", "last_updated"),)
+
+class BankedQuestion(Base):
+    __tablename__ = "question_bank"
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    concept = Column(String, nullable=False)
+    difficulty = Column(String, nullable=False)
+    corpus_version = Column(String, nullable=False)
+    question = Column(Text, nullable=False)
+    options = Column(Text, nullable=False)  # JSON object {"A": ..., "D": ...}
+    correct = Column(String(1), nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    __table_args__ = (
+        UniqueConstraint("topic", "difficulty", "corpus_version", "question", name="uq_question_bank_question"),
+        Index("ix_question_bank_pool", "topic", "difficulty", "corpus_version", "concept"),
+    )
+
+class SeenQuestion(Base):
+    __tablename__ = "seen_questions"
+    id = Column(Integer, primary_key=True)
+    user_name = Column(String, nullable=False)
+    question_id = Column(Integer, ForeignKey("question_bank.id"), nullable=False)
+    seen_at = Column(DateTime, default=datetime.now)
+    __table_args__ = (UniqueConstraint("user_name", "question_id", name="uq_seen_questions_user_question"),)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(String(32), primary_key=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    error = Column(Text)
+    documents = Column(Text)  # JSON list of the corpus documents once the job is done
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    owner = Column(String)  # "host:pid" of the process that queued or is running the job
+    heartbeat_at = Column(DateTime)  # Refreshed by the owner while the job is pending
+    __table_args__ = (Index("ix_ingestion_jobs_status", "status"),)
+
+class IngestionFile(Base):
+    __tablename__ = "ingestion_files"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey("ingestion_jobs.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, processing, processed, reused, failed
+    error = Column(Text)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    __table_args__ = (UniqueConstraint("job_id", "filename", name="uq_ingestion_files_job_file"),)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")  # Readers no longer block the writer
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
 
-def setup_database():
-    engine = create_engine("sqlite:///learning_companion.db")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return engine, Session
+def setup_database(url=None):
+    """Return the process-wide (engine, Session) for `url`, creating tables and indexes once."""
+    url = url or DATABASE_URL
+    with _engines_lock:
+        if url in _engines:
+            return _engines[url]
+        if url.startswith("sqlite"):
+            engine = create_engine(
+                url, pool_size=10, max_overflow=20, pool_timeout=10,
+                connect_args={"check_same_thread": False, "timeout": 10},
+            )
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+        else:
+            engine = create_engine(url, pool_size=10, max_overflow=20, pool_pre_ping=True)
+        Base.metadata.create_all(engine)
+        # create_all skips indexes on tables that already exist, so add any that are missing
+        # ...and the same for nullable columns added to a model after its table was created
+        inspector = inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            missing = [c for c in table.columns if c.name not in existing and c.nullable]
+            with engine.begin() as connection:
+                for column in missing:
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+        Session = sessionmaker(bind=engine, expire_on_commit=False)
+        _engines[url] = (engine, Session)
+        return engine, Session
 
 if __name__ == "__main__":
     engine, Session = setup_database()
@@ -0,0 +1,222 @@
+# embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from metrics import span, increment
+
+DEFAULT_CACHE_PATH = "data/embedding_cache.db"
+
+def normalize_text(text):
+    """Collapse case and whitespace so trivially different strings share a cache entry."""
+    return " ".join(str(text).lower().split())
+
+def text_key(model, text):
+    """Content address of `text` for `model`."""
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingDiskStore:
+    """SQLite-backed embedding store that survives restarts, capped at `max_entries` rows."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present on disk and refresh their recency."""
+        found = {}
+        if not keys:
+            return found
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim).copy()
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs, evicting the least recently used rows beyond the cap."""
+        if not items:
+            return 0
+        now = time.time()
+        rows = [(key, int(vec.shape[0]), np.asarray(vec, dtype=np.float32).tobytes(), now) for key, vec in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            evicted = self._evict()
+            self._conn.commit()
+        return evicted
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        return excess
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddingModel:
+    """Two-level cache (in-process LRU over a disk store) in front of an embedding model.
+
+    Exposes the same `embed_query`/`embed_documents` interface as the wrapped model, and
+    only texts missing from both levels are sent upstream, in a single batch. Concurrent
+    requests share upstream work text by text: a text another request is already fetching
+    is waited for rather than sent again, even when the two batches only overlap.
+    """
+
+    def __init__(self, model, model_name=None, memory_size=4096, disk_store=None):
+        self.model = model
+        self.model_name = model_name or getattr(model, "model", type(model).__name__)
+        self.memory_size = memory_size
+        self.disk_store = disk_store
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "coalesced": 0}
+        self._in_flight = {}  # key -> Future of the vector another request is fetching
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def embed_documents(self, texts, batch_size=32):
+        """Embed texts, serving repeats from cache; returns an (N, d) float32 matrix."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [text_key(self.model_name, t) for t in texts]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+                    self.stats["memory_hits"] += 1
+        pending = list(dict.fromkeys(k for k in keys if k not in vectors))
+        if pending and self.disk_store is not None:
+            on_disk = self.disk_store.get_many(pending)
+            with self._lock:
+                for key, vector in on_disk.items():
+                    self._remember(key, vector)
+                self.stats["disk_hits"] += len(on_disk)
+            vectors.update(on_disk)
+            pending = [k for k in pending if k not in on_disk]
+        increment("cache_hits", len(keys) - len(pending), cache="embedding")
+        if pending:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vectors.update(self._fetch_shared(pending, first_text, batch_size))
+        return np.vstack([vectors[k] for k in keys])
+
+    def _fetch_shared(self, pending, first_text, batch_size):
+        """Vectors for `pending` keys, fetching only those no other request is already fetching.
+
+        Our own keys are fetched and published before waiting on anyone else's, so two
+        requests with overlapping batches can never wait on each other.
+        """
+        vectors = {}
+        with self._lock:
+            waiting = {}
+            owned = []
+            for key in pending:
+                if key in self._memory:  # Fetched by another request since we looked
+                    vectors[key] = self._memory[key]
+                elif key in self._in_flight:
+                    waiting[key] = self._in_flight[key]
+                else:
+                    self._in_flight[key] = Future()
+                    owned.append(key)
+            self.stats["coalesced"] += len(waiting)
+        if owned:
+            try:
+                fresh_items = self._fetch(owned, [first_text[k] for k in owned], batch_size)
+            except BaseException as e:
+                with self._lock:
+                    futures = [self._in_flight.pop(k) for k in owned]
+                for future in futures:
+                    future.set_exception(e)
+                raise
+            with self._lock:
+                futures = {k: self._in_flight.pop(k) for k in owned}
+            for key, vector in fresh_items:
+                futures[key].set_result(vector)
+            vectors.update(fresh_items)
+        for key, future in waiting.items():
+            vectors[key] = future.result()
+        return vectors
+
+    def _fetch(self, keys, texts, batch_size):
+        with span("embedding"):
+            fresh = self.model.embed_documents(texts, batch_size=batch_size)
+        increment("cache_misses", len(keys), cache="embedding")
+        fresh_items = list(zip(keys, np.asarray(fresh, dtype=np.float32)))
+        with self._lock:
+            for key, vector in fresh_items:
+                self._remember(key, vector)
+            self.stats["misses"] += len(fresh_items)
+        if self.disk_store is not None:
+            evicted = self.disk_store.put_many(fresh_items)
+            with self._lock:
+                self.stats["evictions"] += evicted
+        return fresh_items
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0].tolist()
+
+    def cache_info(self):
+        """Hit/miss counters plus current sizes of both cache levels."""
+        with self._lock:
+            info = dict(self.stats, memory_entries=len(self._memory))
+        info["disk_entries"] = len(self.disk_store) if self.disk_store is not None else 0
+        return info
+
+def cached_embedding_model(model, path=None, memory_size=None, max_disk_entries=None):
+    """Wrap `model` in a CachedEmbeddingModel configured from EMBEDDING_CACHE_* env vars."""
+    if path is None:
+        path = os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+    memory_size = memory_size or int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "4096"))
+    max_disk_entries = max_disk_entries or int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+    disk_store = None
+    if path:  # An empty path keeps the cache in memory only
+        try:
+            disk_store = EmbeddingDiskStore(path, max_entries=max_disk_entries)
+        except sqlite3.Error as e:
+            print(f"❌ Embedding disk cache unavailable ({e}); using in-memory cache only")
+    return CachedEmbeddingModel(model, memory_size=memory_size, disk_store=disk_store)
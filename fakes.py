@@ -0,0 +1,78 @@
+# fakes.py
+# Deterministic offline stand-ins for the Groq chat model, the embedding API and web search,
+# with configurable latency, for benchmarks and tests that must not touch the network.
+import hashlib
+import re
+import time
+from local_embeddings import HashingEmbeddingModel
+from resource_search import LocalSearchProvider
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+class FakeChatModel:
+    """Stands in for ChatGroq: answers question prompts with well-formed questions.
+
+    The number of questions and their concepts are read from the prompt, and the text
+    depends only on the prompt, so repeated runs are identical. `latency` is paid once
+    per call; `question_latency` per generated question, and also between streamed blocks.
+    """
+
+    def __init__(self, latency=0.0, question_latency=0.0, chunk_size=24):
+        self.latency = latency
+        self.question_latency = question_latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def _blocks(self, prompt):
+        count = re.search(r"generate (\d+)", prompt)
+        concepts = re.search(r"following concepts: (.+?)\. Each question", prompt)
+        count = int(count.group(1)) if count else 2
+        concepts = concepts.group(1).split(", ") if concepts else ["the topic"]
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        for i in range(count):
+            concept = concepts[i % len(concepts)]
+            correct = "ABCD"[(int(seed, 16) + i) % 4]
+            yield (
+                f"Question: Which statement about {concept} is accurate ({seed}-{i})?\n"
+                f"Options: A) {concept} option one\nB) {concept} option two\n"
+                f"C) {concept} option three\nD) {concept} option four\n"
+                f"Correct: {correct}\n\n"
+            )
+
+    def invoke(self, prompt):
+        self.calls += 1
+        blocks = list(self._blocks(prompt))
+        time.sleep(self.latency + self.question_latency * len(blocks))
+        return FakeMessage("".join(blocks))
+
+    def stream(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        for block in self._blocks(prompt):
+            time.sleep(self.question_latency)
+            for i in range(0, len(block), self.chunk_size):
+                yield FakeMessage(block[i:i + self.chunk_size])
+
+class FakeEmbeddingModel(HashingEmbeddingModel):
+    """Hashed n-gram embeddings with an optional per-call `latency`, standing in for the remote API."""
+
+    def __init__(self, dim=384, latency=0.0):
+        super().__init__(dim=dim)
+        self.latency = latency
+        self.calls = 0
+        self.model = f"fake-{self.model}"
+
+    def embed_documents(self, texts, batch_size=32):
+        self.calls += 1
+        time.sleep(self.latency)
+        return super().embed_documents(texts, batch_size=batch_size)
+
+def fake_apis(llm_latency=0.0, question_latency=0.0, embedding_latency=0.0):
+    """(llms, embeddings) shaped like setup_apis' result, backed by the fakes."""
+    return {"groq": FakeChatModel(llm_latency, question_latency)}, {"local": FakeEmbeddingModel(latency=embedding_latency)}
+
+def fake_search_provider(latency=0.0):
+    """Offline stand-in for DuckDuckGo; see resource_search.set_search_provider."""
+    return LocalSearchProvider(latency=latency)
@@ -0,0 +1,246 @@
+# ingestion_jobs.py
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from db_setup import setup_database, IngestionJob, IngestionFile
+from metrics import REGISTRY, span, increment
+
+PENDING_STATUSES = ("queued", "running")
+FINISHED_FILE_STATUSES = ("processed", "reused", "failed")
+JOB_TTL_DAYS = 7
+HEARTBEAT_SECONDS = 30
+# A pending job whose owner hasn't heartbeated for this long is taken over by another process
+STALE_AFTER = timedelta(seconds=3 * HEARTBEAT_SECONDS)
+
+def _owner():
+    """This process, as recorded on the jobs it has queued or is running."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _owner_gone(owner):
+    """Whether `owner` was a process on this host that no longer exists."""
+    host, _, pid = (owner or "").rpartition(":")
+    if os.name != "posix" or host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:  # Exists but belongs to another user
+        pass
+    return False
+
+class IngestionQueue:
+    """Runs document ingestion jobs off the request thread, tracking them in the database.
+
+    `ingest(progress)` does the work: it is called with a `progress(filename, status,
+    error=None)` callback and returns the names of the documents now in the corpus.
+    Jobs run one at a time per process; jobs in different worker processes can overlap,
+    and the content store and vector index serialize their own writes. Extraction inside
+    a job still fans out over DOCUMENT_WORKERS processes.
+
+    Each job records the process that owns it, and that process heartbeats its pending
+    jobs every HEARTBEAT_SECONDS. A job whose owner has exited or stopped heartbeating is
+    taken over by another process, and a job only starts running through an atomic
+    queued -> running update, so no job runs twice at once.
+    """
+
+    def __init__(self, ingest, job_ttl_days=JOB_TTL_DAYS):
+        self.ingest = ingest
+        self.job_ttl_days = job_ttl_days
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion")
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _ensure_recovered(self):
+        """Start the heartbeat thread on first use in this process; it also recovers orphaned jobs."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._heartbeat_loop, name="ingestion-heartbeat", daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while True:
+            try:
+                self._heartbeat()
+                self._recover()
+            except Exception as e:
+                print(f"Ingestion job heartbeat failed: {type(e).__name__} {e}")
+            time.sleep(HEARTBEAT_SECONDS)
+
+    def _heartbeat(self):
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            session.query(IngestionJob).filter(
+                IngestionJob.owner == _owner(), IngestionJob.status.in_(PENDING_STATUSES)
+            ).update({"heartbeat_at": datetime.now()}, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    def _recover(self):
+        """Drop finished jobs older than the TTL and take over pending jobs whose owner is gone."""
+        owner = _owner()
+        taken = []
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            now = datetime.now()
+            cutoff = now - timedelta(days=self.job_ttl_days)
+            old = [job_id for (job_id,) in session.query(IngestionJob.id).filter(
+                IngestionJob.status.notin_(PENDING_STATUSES), IngestionJob.created_at < cutoff
+            )]
+            if old:
+                session.query(IngestionFile).filter(IngestionFile.job_id.in_(old)).delete(synchronize_session=False)
+                session.query(IngestionJob).filter(IngestionJob.id.in_(old)).delete(synchronize_session=False)
+                session.commit()
+            pending = session.query(IngestionJob.id, IngestionJob.owner, IngestionJob.heartbeat_at).filter(
+                IngestionJob.status.in_(PENDING_STATUSES)
+            ).order_by(IngestionJob.created_at).all()
+            for job_id, job_owner, heartbeat in pending:
+                if job_owner == owner:
+                    continue
+                if heartbeat is not None and heartbeat > now - STALE_AFTER and not _owner_gone(job_owner):
+                    continue
+                # Only if the owner hasn't heartbeated and no other process took the job meanwhile
+                claimed = session.query(IngestionJob).filter(
+                    IngestionJob.id == job_id, IngestionJob.status.in_(PENDING_STATUSES),
+                    IngestionJob.owner == job_owner, IngestionJob.heartbeat_at == heartbeat,
+                ).update(
+                    {"status": "queued", "owner": owner, "heartbeat_at": now, "started_at": None},
+                    synchronize_session=False,
+                )
+                session.commit()
+                if claimed:
+                    taken.append(job_id)
+        finally:
+            session.close()
+        for job_id in taken:
+            print(f"Resuming ingestion job {job_id}")
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, filenames=()):
+        """Queue an ingestion job for the uploaded `filenames`; returns its id right away."""
+        self._ensure_recovered()
+        job_id = uuid.uuid4().hex
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            session.add(IngestionJob(id=job_id, status="queued", owner=_owner(), heartbeat_at=datetime.now()))
+            session.add_all(IngestionFile(job_id=job_id, filename=f, status="queued") for f in dict.fromkeys(filenames))
+            session.commit()
+        finally:
+            session.close()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _update_job(self, job_id, from_status=None, **values):
+        """Update a job this process owns, only if it is in `from_status` when given; False if no row matched."""
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            query = session.query(IngestionJob).filter_by(id=job_id, owner=_owner())
+            if from_status is not None:
+                query = query.filter_by(status=from_status)
+            updated = query.update(values, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+        return updated > 0
+
+    def _progress(self, job_id):
+        """progress callback recording per-file status for `job_id`."""
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            tracked = {f for (f,) in session.query(IngestionFile.filename).filter_by(job_id=job_id)}
+        finally:
+            session.close()
+
+        def progress(filename, status, error=None):
+            # Unchanged files elsewhere in the corpus don't get a row of their own
+            if status == "reused" and filename not in tracked:
+                return
+            tracked.add(filename)
+            session = Session()
+            try:
+                row = session.query(IngestionFile).filter_by(job_id=job_id, filename=filename).one_or_none()
+                if row is None:
+                    row = IngestionFile(job_id=job_id, filename=filename)
+                    session.add(row)
+                row.status = status
+                row.error = error
+                session.commit()
+            finally:
+                session.close()
+        return progress
+
+    def _run(self, job_id):
+        # Claim the job atomically; it may have been taken over or finished meanwhile
+        if not self._update_job(job_id, from_status="queued", status="running", started_at=datetime.now()):
+            return
+        try:
+            with span("ingestion_job"):
+                documents = self.ingest(self._progress(job_id))
+        except Exception as e:
+            print(f"❌ Ingestion job {job_id} failed: {type(e).__name__} {e}")
+            increment("errors", operation="ingestion_job")
+            self._update_job(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=datetime.now())
+            return
+        self._update_job(job_id, status="done", documents=json.dumps(list(documents)), finished_at=datetime.now())
+
+    def status(self, job_id):
+        """The job and its per-file progress as a dict, or None for an unknown id."""
+        self._ensure_recovered()
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            job = session.get(IngestionJob, job_id)
+            if job is None:
+                return None
+            files = session.query(IngestionFile).filter_by(job_id=job_id).order_by(IngestionFile.id).all()
+        finally:
+            session.close()
+        return {
+            "id": job.id,
+            "status": job.status,
+            "error": job.error,
+            "documents": json.loads(job.documents) if job.documents else None,
+            "files": [{"filename": f.filename, "status": f.status, "error": f.error} for f in files],
+            "finished_files": sum(1 for f in files if f.status in FINISHED_FILE_STATUSES),
+            "total_files": len(files),
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+
+    def pending_count(self):
+        engine, Session = setup_database()
+        session = Session()
+        try:
+            return session.query(func.count(IngestionJob.id)).filter(IngestionJob.status.in_(PENDING_STATUSES)).scalar()
+        finally:
+            session.close()
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_ingestion_queue(ingest=None):
+    """Process-wide IngestionQueue; the first call must pass the `ingest` function."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if ingest is None:
+                raise RuntimeError("Ingestion queue not set up; pass the ingest function on first use")
+            _queue = IngestionQueue(ingest)
+            REGISTRY.register_gauge(
+                "ingestion_jobs_pending", "Ingestion jobs queued or running.", lambda: {(): _queue.pending_count()}
+            )
+        return _queue
@@ -0,0 +1,299 @@
+# knowledge_graph.py
+import numpy as np
+from concept_extraction import iter_tokens, STOP_WORDS
+
+# Tokens that end a sentence; co-occurrence windows never span them
+SENTENCE_BREAKS = frozenset(".!?;:")
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+def pack_pairs(a, b):
+    """Encode unordered id pairs as int64 keys (smaller id in the high bits)."""
+    low, high = np.minimum(a, b), np.maximum(a, b)
+    return (low.astype(np.int64) << ID_BITS) | high.astype(np.int64)
+
+def unpack_pairs(keys):
+    return (keys >> ID_BITS).astype(np.intp), (keys & ID_MASK).astype(np.intp)
+
+def rank_within(groups, order):
+    """Position of each element within its group, for elements visited in `order` (grouped)."""
+    sorted_groups = groups[order]
+    starts = np.r_[0, np.flatnonzero(sorted_groups[1:] != sorted_groups[:-1]) + 1]
+    lengths = np.diff(np.r_[starts, len(order)])
+    ranks = np.empty(len(order), dtype=np.intp)
+    ranks[order] = np.arange(len(order)) - np.repeat(starts, lengths)
+    return ranks
+
+class CooccurrenceGraph:
+    """Sliding-window word co-occurrence counts over integer vocabulary ids.
+
+    Content words (no stop words or short tokens) are mapped to compact ids; word
+    counts are a dense array indexed by id and pair counts a sorted sparse array of
+    packed (id, id) keys. Pairs are buffered and folded in with numpy every
+    `flush_size` pairs. Memory stays bounded on arbitrarily long inputs: beyond
+    `max_vocab` words the rarest half of the vocabulary is dropped, and beyond
+    `max_pairs` pairs only the most frequent are kept, so counts for rare words and
+    pairs are approximate. Edges are weighted by positive PMI and converted to
+    networkx only by to_networkx.
+    """
+
+    def __init__(self, window=5, max_vocab=100_000, max_pairs=1_000_000, flush_size=1 << 20, min_length=3, stop_words=STOP_WORDS):
+        self.window = window
+        self.max_vocab = max_vocab
+        self.max_pairs = max_pairs
+        self.flush_size = flush_size
+        self.min_length = min_length
+        self.stop_words = stop_words
+        self.words = []  # id -> word
+        self.ids = {}  # word -> id
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.pair_keys = np.zeros(0, dtype=np.int64)  # Sorted
+        self.pair_counts = np.zeros(0, dtype=np.int64)
+        self.total_tokens = 0
+        self.total_pairs = 0
+        self._buffer = []
+        self._buffered = 0
+        # Last window-1 ids and their sentence numbers, so windows span chunk boundaries
+        self._tail_ids = np.zeros(0, dtype=np.int64)
+        self._tail_sentences = np.zeros(0, dtype=np.int64)
+        self._sentence = 0
+
+    def __getstate__(self):
+        self.flush()
+        return self.__dict__
+
+    def number_of_nodes(self):
+        return len(self.words)
+
+    def number_of_edges(self):
+        self.flush()
+        return len(self.pair_keys)
+
+    def _id(self, word):
+        wid = self.ids.get(word)
+        if wid is None:
+            wid = self.ids[word] = len(self.words)
+            self.words.append(word)
+        return wid
+
+    def add_text(self, text):
+        self.add_chunks([text])
+        return self
+
+    def add_chunks(self, chunks):
+        """Count co-occurrences over streamed text chunks, keeping words split across chunks intact."""
+        carry = ""
+        for chunk in chunks:
+            text = carry + chunk
+            split = len(text)
+            while split and text[split - 1].isalpha():
+                split -= 1
+            text, carry = text[:split], text[split:]
+            self.add_tokens(iter_tokens(text))
+        if carry:
+            self.add_tokens(iter_tokens(carry))
+        self.flush()
+        return self
+
+    def add_tokens(self, tokens):
+        """Count one batch of lowercase tokens (as from iter_tokens) into the graph."""
+        ids = []
+        sentences = []
+        sentence = self._sentence
+        vocab, min_length, stop_words = self.ids, self.min_length, self.stop_words
+        for token in tokens:
+            if token in SENTENCE_BREAKS:
+                sentence += 1
+            elif len(token) >= min_length and token not in stop_words and token.isalpha():
+                wid = vocab.get(token)
+                ids.append(wid if wid is not None else self._id(token))
+                sentences.append(sentence)
+        self._sentence = sentence
+        if not ids:
+            return
+        ids = np.array(ids, dtype=np.int64)
+        self.counts = np.pad(self.counts, (0, len(self.words) - len(self.counts)))
+        self.counts += np.bincount(ids, minlength=len(self.words))
+        self.total_tokens += len(ids)
+
+        tail = len(self._tail_ids)
+        ids = np.concatenate([self._tail_ids, ids])
+        sentences = np.concatenate([self._tail_sentences, np.array(sentences, dtype=np.int64)])
+        for distance in range(1, self.window):
+            if distance >= len(ids):
+                break
+            left, right = ids[:-distance], ids[distance:]
+            # Pairs whose right word is new in this batch, within one sentence, of two different words
+            valid = (sentences[:-distance] == sentences[distance:]) & (left != right)
+            valid[:max(tail - distance, 0)] = False
+            if valid.any():
+                keys = pack_pairs(left[valid], right[valid])
+                self._buffer.append(keys)
+                self._buffered += len(keys)
+                self.total_pairs += len(keys)
+        keep = self.window - 1
+        self._tail_ids, self._tail_sentences = ids[len(ids) - keep:].copy(), sentences[len(ids) - keep:].copy()
+        if self._buffered >= self.flush_size:
+            self.flush()
+        if len(self.words) > self.max_vocab:
+            self._prune_vocab(self.max_vocab // 2)
+
+    def flush(self):
+        """Fold buffered pairs into the sparse pair counts."""
+        if not self._buffer:
+            return
+        keys, counts = np.unique(np.concatenate(self._buffer), return_counts=True)
+        self._buffer = []
+        self._buffered = 0
+        self._add_pair_counts(keys, counts.astype(np.int64))
+
+    def _add_pair_counts(self, keys, counts):
+        if len(self.pair_keys):
+            keys = np.concatenate([self.pair_keys, keys])
+            counts = np.concatenate([self.pair_counts, counts])
+            keys, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+        if len(keys) > self.max_pairs:
+            top = np.sort(np.argpartition(-counts, self.max_pairs - 1)[:self.max_pairs])
+            keys, counts = keys[top], counts[top]
+        self.pair_keys, self.pair_counts = keys, counts
+
+    def _remap(self, kept):
+        """Keep only the word ids in `kept` (sorted), renumbering words and pairs."""
+        self.flush()
+        new_ids = np.full(len(self.words), -1, dtype=np.int64)
+        new_ids[kept] = np.arange(len(kept))
+        self.words = [self.words[i] for i in kept]
+        self.ids = {word: i for i, word in enumerate(self.words)}
+        self.counts = self.counts[kept]
+        left, right = unpack_pairs(self.pair_keys)
+        left, right = new_ids[left], new_ids[right]
+        valid = (left >= 0) & (right >= 0)
+        # Ids keep their relative order, so packed keys stay sorted
+        self.pair_keys = pack_pairs(left[valid], right[valid])
+        self.pair_counts = self.pair_counts[valid]
+        tail = new_ids[self._tail_ids]
+        self._tail_ids, self._tail_sentences = tail[tail >= 0], self._tail_sentences[tail >= 0]
+
+    def _prune_vocab(self, size):
+        kept = np.sort(np.argpartition(-self.counts, size - 1)[:size])
+        self._remap(kept)
+
+    def merge(self, other):
+        """Add another graph's counts into this one, e.g. to fold documents into a corpus graph."""
+        other.flush()
+        self.flush()
+        if not other.words:
+            return self
+        mapping = np.fromiter((self._id(word) for word in other.words), dtype=np.int64, count=len(other.words))
+        self.counts = np.pad(self.counts, (0, len(self.words) - len(self.counts)))
+        self.counts[mapping] += other.counts
+        self.total_tokens += other.total_tokens
+        self.total_pairs += other.total_pairs
+        left, right = unpack_pairs(other.pair_keys)
+        keys = pack_pairs(mapping[left], mapping[right])
+        order = np.argsort(keys)
+        self._add_pair_counts(keys[order], other.pair_counts[order])
+        if len(self.words) > self.max_vocab:
+            self._prune_vocab(self.max_vocab // 2)
+        return self
+
+    def edge_weights(self, min_count=2):
+        """(left ids, right ids, counts, PMI) for pairs seen at least `min_count` times with positive PMI.
+
+        PMI is log(p(a, b) / (p(a) p(b))), with pair probabilities over all counted pairs
+        and word probabilities over all counted tokens. `min_count` guards against rare
+        pairs getting inflated scores, and is relaxed to 1 if no pair reaches it.
+        """
+        self.flush()
+        counts = self.pair_counts
+        keep = counts >= min_count
+        if not keep.any():
+            keep = counts > 0
+        left, right = unpack_pairs(self.pair_keys[keep])
+        counts = counts[keep]
+        if not len(counts):
+            return left, right, counts, np.zeros(0)
+        pmi = np.log(counts * (float(self.total_tokens) ** 2 / self.total_pairs)) - np.log(self.counts[left] * self.counts[right].astype(np.float64))
+        positive = pmi > 0
+        return left[positive], right[positive], counts[positive], pmi[positive]
+
+    def top_edges(self, top_k=10, min_count=2):
+        """edge_weights, pruned to each word's `top_k` highest-PMI edges (an edge stays if either end keeps it)."""
+        left, right, counts, pmi = self.edge_weights(min_count)
+        if top_k is None or not len(pmi):
+            return left, right, counts, pmi
+        keep = np.zeros(len(pmi), dtype=bool)
+        for node in (left, right):
+            order = np.lexsort((-pmi, node))
+            keep |= rank_within(node, order) < top_k
+        return left[keep], right[keep], counts[keep], pmi[keep]
+
+    def pruned(self, max_nodes=200, top_k=10, min_count=2):
+        """Compact copy with the `max_nodes` most frequent words and their `top_k` strongest edges.
+
+        Totals are kept, so PMI in the copy matches the full graph.
+        """
+        self.flush()
+        graph = CooccurrenceGraph(self.window, self.max_vocab, self.max_pairs, self.flush_size, self.min_length, self.stop_words)
+        graph.words, graph.ids, graph.counts = list(self.words), dict(self.ids), self.counts.copy()
+        graph.pair_keys, graph.pair_counts = self.pair_keys, self.pair_counts
+        graph.total_tokens, graph.total_pairs = self.total_tokens, self.total_pairs
+        if max_nodes and len(graph.words) > max_nodes:
+            graph._remap(np.sort(np.argpartition(-graph.counts, max_nodes - 1)[:max_nodes]))
+        left, right, counts, _ = graph.top_edges(top_k, min_count)
+        keys = pack_pairs(left, right)
+        order = np.argsort(keys)
+        graph.pair_keys, graph.pair_counts = keys[order], counts[order]
+        graph._tail_ids = graph._tail_sentences = np.zeros(0, dtype=np.int64)
+        return graph
+
+    def node_rows(self):
+        """[(word, count)] in id order, for storage."""
+        return [(word, int(count)) for word, count in zip(self.words, self.counts)]
+
+    def edge_rows(self, min_count=1):
+        """[(word, word, PMI, count)] for every edge with positive PMI, for storage."""
+        left, right, counts, pmi = self.edge_weights(min_count)
+        return [(self.words[a], self.words[b], float(w), int(c)) for a, b, w, c in zip(left, right, pmi, counts)]
+
+    @classmethod
+    def from_rows(cls, nodes, edges, total_tokens, total_pairs, window=5):
+        """Rebuild a graph from node_rows output, (word, word, count) edges and its totals."""
+        graph = cls(window)
+        graph.words = [word for word, _ in nodes]
+        graph.ids = {word: i for i, word in enumerate(graph.words)}
+        graph.counts = np.array([count for _, count in nodes], dtype=np.int64)
+        if edges:
+            left = np.array([graph.ids[a] for a, _, _ in edges], dtype=np.int64)
+            right = np.array([graph.ids[b] for _, b, _ in edges], dtype=np.int64)
+            keys = pack_pairs(left, right)
+            order = np.argsort(keys)
+            graph.pair_keys = keys[order]
+            graph.pair_counts = np.array([count for _, _, count in edges], dtype=np.int64)[order]
+        graph.total_tokens, graph.total_pairs = total_tokens, total_pairs
+        return graph
+
+    def to_networkx(self, top_k=10, min_count=2, max_nodes=None):
+        """networkx Graph of words (with `count`) and their top PMI edges (`weight`, `count`)."""
+        import networkx as nx
+        graph = self.pruned(max_nodes, top_k, min_count) if max_nodes else self
+        left, right, counts, pmi = graph.top_edges(top_k, min_count)
+        G = nx.Graph()
+        G.add_nodes_from((word, {"count": int(count)}) for word, count in zip(graph.words, graph.counts))
+        G.add_edges_from(
+            (graph.words[a], graph.words[b], {"weight": float(w), "count": int(c)})
+            for a, b, c, w in zip(left, right, counts, pmi)
+        )
+        return G
+
+    def neighbors(self, word, top_k=10, min_count=2):
+        """[(word, PMI)] for `word`'s strongest edges, best first; [] for unknown words."""
+        wid = self.ids.get(word.lower())
+        if wid is None:
+            return []
+        left, right, _, pmi = self.edge_weights(min_count)
+        mask = (left == wid) | (right == wid)
+        others = np.where(left[mask] == wid, right[mask], left[mask])
+        order = np.argsort(-pmi[mask], kind="stable")[:top_k]
+        return [(self.words[others[i]], float(pmi[mask][i])) for i in order]
@@ -1,21 +1,18 @@
 # learning_assessment.py
 from db_setup import setup_database, UserProfile, Progress
+from sqlalchemy import insert, func
 from sqlalchemy.orm import Session
-from api_setup import setup_apis
-from content_processing import process_documents
-import os
-from collections import Counter
+from datetime import datetime
+from api_setup import setup_apis, get_embedding_model
+from content_processing import process_documents_incremental, phrase_embeddings
+from concept_extraction import extract_candidates
+from vector_index import get_vector_index, retrieve_context
+from llm_client import get_llm_client
+from mind_map import render_mind_map, mind_map_path
+from resource_search import get_resource_cache, get_search_provider
+from metrics import span, timed, increment
 import re
-import networkx as nx
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend
-import matplotlib.pyplot as plt
-MATPLOTLIB_AVAILABLE = True
-from duckduckgo_search import DDGS
-import pickle
 import time
-import glob
-import threading
 import numpy as np
 
 VARK_QUESTIONS = [
@@ -45,30 +42,49 @@ def assess_learning_style():
     print(f"Dominant style: {dominant_style}")
     return dominant_style
 
+def cosine_similarities(query, matrix):
+    """Cosine similarity of `query` against every row of `matrix` in one matrix-vector product."""
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    query_norm = np.linalg.norm(query) or 1.0
+    row_norms = np.linalg.norm(matrix, axis=1)
+    row_norms[row_norms == 0] = 1.0
+    return (matrix @ query) / (row_norms * query_norm)
+
+def top_k_indices(scores, k):
+    """Indices of the `k` highest scores, best first, without sorting the full array."""
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")].tolist()
+
 # learning_assessment.py (snippet)
+@timed("concept_extraction")
 def extract_key_concepts(content, topic, embedding_model, num_concepts=5):
     print("Extracting key concepts...")
     start_time = time.time()
-    all_text = " ".join(content.values()).lower()[:10000] if content else ""
-    words = re.findall(r'\b\w+\b', all_text)
-    bigrams = [" ".join([words[i], words[i+1]]) for i in range(len(words)-1) if all(len(w) > 3 and w.isalpha() for w in [words[i], words[i+1]])][:100]
-    
-    stop_words = {"this", "that", "with", "from", "which", "about", "editors", "published", "university", "handbook", "borko", "furht", "armando", "escalante", "science", "florida", "example", "themoore", "penrosepseudoinverse", "termmemoryandothergatedrnns"}
-    phrase_counts = Counter(bigrams)
+    candidates = extract_candidates(content, max_candidates=100) if content else []
     
     topic_lower = topic.lower()
-    candidates = [c for c in phrase_counts.keys() if not any(sw in c.split() for sw in stop_words)]
-    if not candidates and not content:
+    if not candidates:  # No documents, or documents without any candidate phrases
         candidates = [f"{topic_lower} {i+1}" for i in range(num_concepts)]
     
     if candidates and embedding_model:
-        topic_embedding = embedding_model.embed_query(topic_lower)
-        candidate_embeddings = [embedding_model.embed_query(c) for c in candidates]
-        similarities = [np.dot(topic_embedding, c_emb) / (np.linalg.norm(topic_embedding) * np.linalg.norm(c_emb)) for c_emb in candidate_embeddings]
-        ranked = sorted(zip(candidates, similarities), key=lambda x: x[1], reverse=True)
-        unique_concepts = [c for c, s in ranked if s > 0.8][:num_concepts]  # Raised threshold
+        store = getattr(content, "store", None)
+        if store is not None:
+            # Candidate embeddings were precomputed at ingest; only the topic is embedded now
+            topic_vector = embedding_model.embed_documents([topic_lower])[0]
+            similarities = cosine_similarities(topic_vector, phrase_embeddings(store, candidates, embedding_model))
+        else:
+            # Topic and candidates go out in one batched request; row 0 is the topic
+            matrix = embedding_model.embed_documents([topic_lower] + candidates)
+            similarities = cosine_similarities(matrix[0], matrix[1:])
+        ranked = top_k_indices(similarities, 2 * num_concepts)
+        unique_concepts = [candidates[i] for i in ranked[:num_concepts] if similarities[i] > 0.8]  # Raised threshold
         if len(unique_concepts) < num_concepts:
-            unique_concepts.extend([c for c, _ in ranked[num_concepts:]][:num_concepts - len(unique_concepts)])
+            unique_concepts.extend([candidates[i] for i in ranked[num_concepts:]][:num_concepts - len(unique_concepts)])
     else:
         unique_concepts = list(dict.fromkeys(candidates))[:num_concepts]
     
@@ -76,134 +92,191 @@ def extract_key_concepts(content, topic, embedding_model, num_concepts=5):
     return unique_concepts
 
 def generate_mind_map(concepts, topic):
-    G = nx.Graph()
-    G.add_node(topic, type="root")
-    for concept in concepts:
-        G.add_node(concept, type="concept")
-        G.add_edge(topic, concept)
-    
     mind_map_text = f"{topic}\n"
     for concept in concepts:
         mind_map_text += f"  ├── {concept}\n"
     
-    plt.figure(figsize=(8, 6))
-    pos = nx.spring_layout(G)
-    nx.draw(G, pos, with_labels=True, node_color="lightblue", node_size=2000, font_size=10, font_weight="bold")
-    plt.title(f"Mind Map for {topic}")
-    plt.savefig("static/mind_map.png", bbox_inches='tight')
-    plt.close()  # Always close the figure
-    print("Mind map saved as 'static/mind_map.png'")
+    path = mind_map_path(render_mind_map(topic, concepts))
+    print(f"Mind map saved as '{path}'")
     
     return mind_map_text
 
-def search_web(topic, style, grok_instance):
-    print("Searching web with DuckDuckGo...")
-    start_time = time.time()
+def fallback_resources(topic, style):
+    increment("fallbacks", kind="resources")
+    return [
+        {"title": f"X Post on {topic}", "url": "https://x.com", "description": f"A recent post: 'Loving this {VARK_CONTENT[style]['type']} {topic} tutorial!'"},
+        {"title": f"X Post on {topic}", "url": "https://x.com", "description": f"Check out this {VARK_CONTENT[style]['keywords'][0]} on {topic}!"},
+        {"title": f"X Post on {topic}", "url": "https://x.com", "description": f"Someone shared a great {VARK_CONTENT[style]['type']} resource for {topic}."}
+    ]
+
+def _resource_search(topic, style):
+    """Cache key and fetch function for the resources matching `topic` and `style`."""
     query = f"{topic} {VARK_CONTENT[style]['type']} educational resources {', '.join(VARK_CONTENT[style]['keywords'])}"
-    try:
-        with DDGS() as ddgs:
-            results = [r for r in ddgs.text(query, region="us-en", safesearch="moderate", max_results=3)]
-        formatted_results = [
+
+    def fetch():
+        results = get_search_provider().search(query, max_results=3)
+        return [
             {
                 "title": r.get("title", "Untitled"),
                 "url": r.get("href", "https://duckduckgo.com"),
                 "description": r.get("body", f"A {VARK_CONTENT[style]['type']} resource on {topic}")
             } for r in results
         ]
-    except Exception as e:
-        print(f"DuckDuckGo search failed: {e}. Using Grok's mock X search...")
-        formatted_results = [
-            {"title": f"X Post on {topic}", "url": "https://x.com", "description": f"A recent post: 'Loving this {VARK_CONTENT[style]['type']} {topic} tutorial!'"},
-            {"title": f"X Post on {topic}", "url": "https://x.com", "description": f"Check out this {VARK_CONTENT[style]['keywords'][0]} on {topic}!"},
-            {"title": f"X Post on {topic}", "url": "https://x.com", "description": f"Someone shared a great {VARK_CONTENT[style]['type']} resource for {topic}."}
-        ]
+    return (" ".join(topic.lower().split()), style), fetch
+
+def prefetch_web_search(topic, style):
+    """Start the resource search for `topic` in the background so search_web finds it cached."""
+    key, fetch = _resource_search(topic, style)
+    get_resource_cache().prefetch(key, fetch)
+
+def search_web(topic, style, grok_instance, deadline=None):
+    print("Searching web with DuckDuckGo...")
+    start_time = time.time()
+    key, fetch = _resource_search(topic, style)
+    formatted_results = get_resource_cache().get(
+        key, fetch, lambda: fallback_resources(topic, style), deadline=deadline
+    )
     print(f"Web search completed (took {time.time() - start_time:.2f}s)")
     return formatted_results
 
+def difficulty_for_score(score):
+    return "basic" if score < 50 else "intermediate" if score <= 75 else "advanced"
+
 def invoke_llm_with_timeout(llm, prompt, timeout_seconds=10):
-    result = [None]
-    def worker():
-        result[0] = llm.invoke(prompt).content
-    
-    thread = threading.Thread(target=worker)
-    thread.start()
-    thread.join(timeout_seconds)
-    if thread.is_alive():
-        print(f"LLM invocation timed out after {timeout_seconds}s")
-        return None
-    return result[0]
+    """Invoke the LLM through its shared bounded client; None on timeout or failure."""
+    return get_llm_client(llm).invoke(prompt, timeout=timeout_seconds)
+
+# Updated regex to handle more formats
+QUESTION_PATTERN = re.compile(r"(?:\*\*Question(?: \d+)?:\*\*|## Question \d+:|Question:)\s*(.+?)\s*(?:\n\s*\*\*Options:\*\*|\n\s*Options:|\nOptions:)\s*(.+?)\s*(?:\n\s*\*\*Correct:\*\*|\n\s*Correct:|\nCorrect:)\s*([A-D])\)?\s*(?:\n|$)", re.DOTALL)
+
+def question_prompt(concepts, topic, difficulty, num_questions, used_questions, context=None):
+    prompt = f"For the topic '{topic}', generate {num_questions} {difficulty}-level multiple-choice quiz questions about the following concepts: {', '.join(concepts)}. Each question should have 4 options (A, B, C, D) and one correct answer. Avoid repeating these questions: {', '.join(used_questions) if used_questions else 'none'}. Ensure relevance to {topic}. Format each as: 'Question: [q] Options: A) [a] B) [b] C) [c] D) [d] Correct: [letter]' separated by newlines."
+    if context:
+        prompt += f"\n\nBase the questions on these excerpts from the learner's study materials:\n{context}"
+    return prompt
+
+def parse_question(match, used_questions):
+    """Question dict for a QUESTION_PATTERN match, or None if it is incomplete or already used."""
+    q_part, opts_part, correct_part = match
+    q_part = q_part.strip()
+    options = {}
+    for line in opts_part.split('\n'):
+        line = line.strip()
+        if line and line[0] in "ABCD" and ")" in line:
+            letter = line[0]
+            text = line.split(")", 1)[1].strip()
+            options[letter] = text
+    if q_part and len(options) == 4 and correct_part in "ABCD" and q_part not in used_questions:
+        return {"question": q_part, "options": options, "correct": correct_part}
+    print(f"Debug: Failed to parse match: q='{q_part}', opts={len(options)}, correct='{correct_part}'")
+    return None
+
+def fallback_questions(concepts, topic):
+    concepts = concepts or [topic]
+    return [
+        {"question": f"How does {concepts[0]} enable {topic}?", "options": {"A": "Scalability and flexibility", "B": "Increased hardware costs", "C": "Limited access", "D": "Manual processing"}, "correct": "A", "fallback": True},
+        {"question": f"What role does {concepts[1 if len(concepts) > 1 else 0]} play in {topic}?", "options": {"A": "Algorithm development", "B": "Hardware design", "C": "Data storage", "D": "Weather prediction"}, "correct": "A", "fallback": True}
+    ]
 
-def generate_questions_from_concepts(llm, concepts, topic, score, num_questions=2, used_questions=None):
+def generate_questions_from_concepts(llm, concepts, topic, score, num_questions=2, used_questions=None, context=None):
     if used_questions is None:
         used_questions = set()
     print("Generating questions...")
     start_time = time.time()
     questions = []
     
-    difficulty = "basic" if score < 50 else "intermediate" if score <= 75 else "advanced"
-    prompt = f"For the topic '{topic}', generate {num_questions} {difficulty}-level multiple-choice quiz questions about the following concepts: {', '.join(concepts)}. Each question should have 4 options (A, B, C, D) and one correct answer. Avoid repeating these questions: {', '.join(used_questions) if used_questions else 'none'}. Ensure relevance to {topic}. Format each as: 'Question: [q] Options: A) [a] B) [b] C) [c] D) [d] Correct: [letter]' separated by newlines."
-    try:
-        response = invoke_llm_with_timeout(llm, prompt)
-        if response is None:
-            raise Exception("Timeout occurred")
+    difficulty = difficulty_for_score(score)
+    prompt = question_prompt(concepts, topic, difficulty, num_questions, used_questions, context)
+    response = invoke_llm_with_timeout(llm, prompt)
+    if response is None:
+        print("LLM invocation failed. Using fallback questions.")
+    else:
         debug_response = re.sub(r"Correct: [A-D]\)?\s*(?=\n\n|$)", "", response, flags=re.DOTALL).strip()
         print(f"Debug: LLM batch questions (answers hidden): {debug_response}")
-    except Exception as e:
-        print(f"LLM invocation failed: {e}. Using fallback questions.")
-        response = (
-            f"Question: How does {concepts[0]} enable {topic}?\nOptions: A) Scalability and flexibility B) Increased hardware costs C) Limited access D) Manual processing\nCorrect: A\n\n"
-            f"Question: What role does {concepts[1 if len(concepts) > 1 else 0]} play in {topic}?\nOptions: A) Algorithm development B) Hardware design C) Data storage D) Weather prediction\nCorrect: A"
-        )
-        debug_response = re.sub(r"Correct: [A-D]\)?\s*(?=\n\n|$)", "", response, flags=re.DOTALL).strip()
-        print(f"Debug: Fallback questions (answers hidden): {debug_response}")
-    
-    # Updated regex to handle more formats
-    question_pattern = re.compile(r"(?:\*\*Question(?: \d+)?:\*\*|## Question \d+:|Question:)\s*(.+?)\s*(?:\n\s*\*\*Options:\*\*|\n\s*Options:|\nOptions:)\s*(.+?)\s*(?:\n\s*\*\*Correct:\*\*|\n\s*Correct:|\nCorrect:)\s*([A-D])\)?\s*(?:\n|$)", re.DOTALL)
-    matches = question_pattern.findall(response)
-    if not matches:
-        print(f"Debug: No questions parsed from response. Raw response: {response}")
-    
-    for i, match in enumerate(matches):
-        q_part, opts_part, correct_part = match
-        q_part = q_part.strip()
-        options = {}
-        for line in opts_part.split('\n'):
-            line = line.strip()
-            if line and line[0] in "ABCD" and ")" in line:
-                letter = line[0]
-                text = line.split(")", 1)[1].strip()
-                options[letter] = text
-        if q_part and len(options) == 4 and correct_part in "ABCD" and q_part not in used_questions:
-            used_questions.add(q_part)
-            questions.append({"question": q_part, "options": options, "correct": correct_part})
-        else:
-            print(f"Debug: Failed to parse match {i}: q='{q_part}', opts={len(options)}, correct='{correct_part}'")
+        with span("question_parsing"):
+            matches = QUESTION_PATTERN.findall(response)
+            if not matches:
+                print(f"Debug: No questions parsed from response. Raw response: {response}")
+            for match in matches:
+                question = parse_question(match, used_questions)
+                if question is not None:
+                    used_questions.add(question["question"])
+                    questions.append(question)
     
     if len(questions) < num_questions:
         print(f"Debug: Only {len(questions)} valid questions parsed. Using fallback.")
-        fallback_questions = [
-            {"question": f"How does {concepts[0]} enable {topic}?", "options": {"A": "Scalability and flexibility", "B": "Increased hardware costs", "C": "Limited access", "D": "Manual processing"}, "correct": "A"},
-            {"question": f"What role does {concepts[1 if len(concepts) > 1 else 0]} play in {topic}?", "options": {"A": "Algorithm development", "B": "Hardware design", "C": "Data storage", "D": "Weather prediction"}, "correct": "A"}
-        ]
-        questions.extend([q for q in fallback_questions if q["question"] not in used_questions][:num_questions - len(questions)])
+        increment("fallbacks", num_questions - len(questions), kind="questions")
+        questions.extend([q for q in fallback_questions(concepts, topic) if q["question"] not in used_questions][:num_questions - len(questions)])
     
     print(f"Question generation completed (took {time.time() - start_time:.2f}s)")
     return questions[:num_questions], used_questions
 
-def load_or_process_documents(force_reprocess=False):
-    cache_file = "data/processed_content.pkl"
+def iter_question_matches(chunks):
+    """Yield QUESTION_PATTERN matches from a stream of text chunks as soon as each block is complete.
+    
+    A block counts as complete once text follows its "Correct:" letter, or the stream ends,
+    so a letter split across chunks is never cut short.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        consumed = 0
+        for match in QUESTION_PATTERN.finditer(buffer):
+            if match.end() >= len(buffer):
+                break
+            consumed = match.end()
+            yield match.groups()
+        buffer = buffer[consumed:]
+    for match in QUESTION_PATTERN.finditer(buffer):
+        yield match.groups()
+
+def stream_questions_from_concepts(llm, concepts, topic, score, num_questions=2, used_questions=None, context=None, timeout=10, cancel=None):
+    """Streaming counterpart of generate_questions_from_concepts: yields each validated question
+    as soon as the model has finished writing it, then fallbacks for any shortfall.
+    
+    `used_questions` is updated as questions are yielded. Setting `cancel` (a threading.Event)
+    stops the model and ends the generator without fallbacks.
+    """
+    if used_questions is None:
+        used_questions = set()
+    print("Streaming questions...")
+    start_time = time.time()
+    difficulty = difficulty_for_score(score)
+    prompt = question_prompt(concepts, topic, difficulty, num_questions, used_questions, context)
+    count = 0
+    chunks = get_llm_client(llm).stream(prompt, timeout=timeout, cancel=cancel)
+    try:
+        for match in iter_question_matches(chunks):
+            question = parse_question(match, used_questions)
+            if question is None:
+                continue
+            used_questions.add(question["question"])
+            count += 1
+            print(f"Debug: Streamed question {count} after {time.time() - start_time:.2f}s")
+            yield question
+            if count >= num_questions:
+                return
+    finally:
+        chunks.close()  # Stops the model once enough questions have been parsed
+    
+    if cancel is not None and cancel.is_set():
+        return
+    if count < num_questions:
+        print(f"Debug: Only {count} valid questions streamed. Using fallback.")
+        increment("fallbacks", num_questions - count, kind="questions")
+        for question in [q for q in fallback_questions(concepts, topic) if q["question"] not in used_questions][:num_questions - count]:
+            used_questions.add(question["question"])
+            yield question
+    print(f"Question streaming completed (took {time.time() - start_time:.2f}s)")
+
+def load_or_process_documents(force_reprocess=False, embedding_model=None, progress=None):
     raw_dir = "data/raw/"
-    if force_reprocess or not os.path.exists(cache_file) or any(os.path.getmtime(f) > os.path.getmtime(cache_file) for f in glob.glob(f"{raw_dir}/*") if os.path.isfile(f)):
-        print("Processing documents...")
-        start_time = time.time()
-        content, graphs = process_documents()
-        with open(cache_file, 'wb') as f:
-            pickle.dump((content, graphs), f)
-        print(f"Document processing completed (took {time.time() - start_time:.2f}s)")
-        return content, graphs
-    print("Loading cached document content...")
-    with open(cache_file, 'rb') as f:
-        return pickle.load(f)
+    print("Loading document content...")
+    start_time = time.time()
+    index = get_vector_index() if embedding_model is not None else None
+    content, graphs, stats = process_documents_incremental(raw_dir, force=force_reprocess, index=index, embedding_model=embedding_model, progress=progress)
+    print(f"Document loading completed: {stats['processed']} processed, {stats['reused']} reused, {stats['failed']} failed, {stats['removed']} removed (took {time.time() - start_time:.2f}s)")
+    return content, graphs
 
 def assess_knowledge(llm, topic, content, embedding_model, score, style, phase="Baseline", used_questions=None):
     correct = 0
@@ -219,11 +292,12 @@ def assess_knowledge(llm, topic, content, embedding_model, score, style, phase="
         if confirm != "yes":
             print("Please upload relevant documents to 'data/raw/' and press Enter to retry...")
             input()
-            content, _ = load_or_process_documents(force_reprocess=True)
+            content, _ = load_or_process_documents(embedding_model=embedding_model)
             concepts = extract_key_concepts(content, topic, embedding_model)
     
-    questions, used_questions = generate_questions_from_concepts(llm, concepts, topic, score, used_questions=used_questions)
-    difficulty = "basic" if score < 50 else "intermediate" if score <= 75 else "advanced"
+    context = retrieve_context(get_vector_index(), embedding_model, concepts, filenames=list(content)) if content else ""
+    questions, used_questions = generate_questions_from_concepts(llm, concepts, topic, score, used_questions=used_questions, context=context)
+    difficulty = difficulty_for_score(score)
     print(f"\nAssessing your {phase.lower()} knowledge of {topic} ({difficulty.capitalize()} Level):")
     incorrect_concepts = []
     for q in questions:
@@ -256,6 +330,7 @@ def personalize_learning(llm, topic, style, baseline_score, content, embedding_m
     used_questions = set()
     score = baseline_score
     concepts = extract_key_concepts(content, topic, embedding_model)
+    prefetch_web_search(topic, style)  # Searches while the learner takes the follow-up
     
     while True:
         mind_map = generate_mind_map(concepts, topic)
@@ -285,46 +360,158 @@ def personalize_learning(llm, topic, style, baseline_score, content, embedding_m
     
     return score
 
-def review_progress(name):
+WEAK_SCORE_THRESHOLD = 75
+
+def progress_summary(name, page=1, per_page=20, weak_threshold=WEAK_SCORE_THRESHOLD):
+    """Per-topic progress for `name`, aggregated in SQL and paginated by most recent activity.
+    
+    Returns None for an unknown user, else a dict with `topics` (attempts, latest, best and
+    average score per topic for the requested page), `weak_areas` (every topic whose latest
+    score is below `weak_threshold`) and the pagination fields `page`, `per_page`,
+    `total_topics` and `pages`.
+    """
+    page = max(int(page), 1)
+    per_page = min(max(int(per_page), 1), 100)
     engine, Session = setup_database()
     session = Session()
-    user = session.query(UserProfile).filter_by(name=name).first()
-    if not user:
+    try:
+        user = session.query(UserProfile).filter_by(name=name).first()
+        if not user:
+            return None
+        
+        # Latest attempt per topic via a window over the (user_id, subject, last_updated) index
+        ranked = session.query(
+            Progress.subject.label("subject"),
+            Progress.score.label("score"),
+            Progress.phase.label("phase"),
+            func.row_number().over(
+                partition_by=Progress.subject,
+                order_by=(Progress.last_updated.desc(), Progress.id.desc()),
+            ).label("rank"),
+        ).filter(Progress.user_id == user.id).subquery()
+        latest = session.query(ranked.c.subject, ranked.c.score, ranked.c.phase).filter(ranked.c.rank == 1).subquery()
+        
+        totals = session.query(
+            Progress.subject.label("subject"),
+            func.count(Progress.id).label("attempts"),
+            func.max(Progress.score).label("best_score"),
+            func.avg(Progress.score).label("average_score"),
+            func.max(Progress.last_updated).label("last_updated"),
+        ).filter(Progress.user_id == user.id).group_by(Progress.subject).subquery()
+        
+        total_topics = session.query(func.count()).select_from(totals).scalar()
+        rows = session.query(totals, latest.c.score, latest.c.phase).join(
+            latest, latest.c.subject == totals.c.subject
+        ).order_by(totals.c.last_updated.desc(), totals.c.subject).offset((page - 1) * per_page).limit(per_page).all()
+        weak_areas = [subject for (subject,) in session.query(latest.c.subject).filter(
+            latest.c.score < weak_threshold
+        ).order_by(latest.c.subject)]
+    finally:
+        session.close()
+    
+    topics = [{
+        "subject": row.subject,
+        "attempts": row.attempts,
+        "latest_score": row.score,
+        "latest_phase": row.phase,
+        "best_score": row.best_score,
+        "average_score": round(row.average_score, 1),
+        "last_updated": row.last_updated.isoformat(sep=" ", timespec="seconds") if row.last_updated else None,
+        "weak": row.score < weak_threshold,
+    } for row in rows]
+    return {
+        "name": name,
+        "learning_style": user.learning_style,
+        "topics": topics,
+        "weak_areas": weak_areas,
+        "page": page,
+        "per_page": per_page,
+        "total_topics": total_topics,
+        "pages": max((total_topics + per_page - 1) // per_page, 1),
+    }
+
+def review_progress(name):
+    summary = progress_summary(name, per_page=100)
+    if summary is None:
         print("No progress found for this user yet.")
-        return
+        return None
     print(f"\nProgress Review for {name}:")
-    progresses = session.query(Progress).filter_by(user_id=user.id).order_by(Progress.last_updated).all()
-    for p in progresses:
-        print(f"Topic: {p.subject}, Phase: {p.phase}, Score: {p.score}%, Updated: {p.last_updated}")
-    weak_areas = [p.subject for p in progresses if p.score < 75]
-    if weak_areas:
-        print(f"Suggested topics to revisit: {', '.join(set(weak_areas))}")
-    session.close()
+    for t in summary["topics"]:
+        print(f"Topic: {t['subject']}, Latest: {t['latest_score']}% ({t['latest_phase']}), Best: {t['best_score']}%, "
+              f"Average: {t['average_score']}% over {t['attempts']} attempts, Updated: {t['last_updated']}")
+    if summary["weak_areas"]:
+        print(f"Suggested topics to revisit: {', '.join(summary['weak_areas'])}")
+    return summary
 
+@timed("db_write")
 def update_user_profile(name, learning_style, topic, baseline_score, final_score):
     engine, Session = setup_database()
     session = Session()
-    user = session.query(UserProfile).filter_by(name=name).first()
-    if not user:
-        user = UserProfile(name=name, learning_style=learning_style)
-        session.add(user)
-    else:
-        user.learning_style = learning_style
-    session.commit()
+    try:
+        user = session.query(UserProfile).filter_by(name=name).first()
+        if not user:
+            user = UserProfile(name=name, learning_style=learning_style)
+            session.add(user)
+            session.flush()  # Assigns user.id within the same transaction
+        else:
+            user.learning_style = learning_style
+        
+        session.add_all([
+            Progress(user_id=user.id, subject=topic, score=baseline_score, phase="baseline"),
+            Progress(user_id=user.id, subject=topic, score=final_score, phase="follow-up"),
+        ])
+        session.commit()
+        user_id = user.id
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
     
-    baseline_progress = Progress(user_id=user.id, subject=topic, score=baseline_score, phase="baseline")
-    final_progress = Progress(user_id=user.id, subject=topic, score=final_score, phase="follow-up")
-    session.add(baseline_progress)
-    session.add(final_progress)
-    session.commit()
+    print(f"Updated profile for {name} (ID: {user_id}) with style {learning_style}, baseline score {baseline_score}%, final score {final_score}%")
+    return user_id
+
+@timed("db_write")
+def record_progress_bulk(records):
+    """Write many progress rows in one transaction.
     
-    print(f"Updated profile for {name} (ID: {user.id}) with style {learning_style}, baseline score {baseline_score}%, final score {final_score}%")
-    session.close()
-    return user.id
+    `records` is an iterable of dicts with name, learning_style, topic, score and phase.
+    Users are looked up in one query and missing ones created; rows are inserted with a
+    single executemany. Returns the number of rows written.
+    """
+    records = list(records)
+    if not records:
+        return 0
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        names = {r["name"] for r in records}
+        users = {u.name: u for u in session.query(UserProfile).filter(UserProfile.name.in_(names))}
+        for r in records:
+            user = users.get(r["name"])
+            if user is None:
+                user = users[r["name"]] = UserProfile(name=r["name"], learning_style=r.get("learning_style"))
+                session.add(user)
+            elif r.get("learning_style"):
+                user.learning_style = r["learning_style"]
+        session.flush()
+        now = datetime.now()
+        session.execute(insert(Progress), [
+            {"user_id": users[r["name"]].id, "subject": r["topic"], "score": r["score"], "phase": r["phase"], "last_updated": now}
+            for r in records
+        ])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return len(records)
 
 def main_menu():
     llms, embeddings = setup_apis()
-    if not llms.get("groq") or not embeddings.get("huggingface"):
+    embedding_model = get_embedding_model(embeddings)
+    if not llms.get("groq") or not embedding_model:
         print("❌ Required APIs not available. Exiting.")
         exit(1)
     
@@ -343,8 +530,7 @@ def main_menu():
             print("\nPlease upload study materials to 'data/raw/' for your topic (optional).")
             input("Press Enter once files are uploaded or to proceed without files...")
             
-            content, graphs = load_or_process_documents()
-            embedding_model = embeddings["huggingface"]
+            content, graphs = load_or_process_documents(embedding_model=embedding_model)
             baseline_score, used_questions, _ = assess_knowledge(llms["groq"], topic, content, embedding_model, 0, style, phase="Baseline")
             final_score = personalize_learning(llms["groq"], topic, style, baseline_score, content, embedding_model, llms["groq"])
             update_user_profile(name, style, topic, baseline_score, final_score)
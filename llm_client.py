@@ -0,0 +1,265 @@
+# llm_client.py
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from single_flight import SingleFlight, key_for
+from metrics import REGISTRY, observe, increment
+
+TRANSIENT_ERROR_NAMES = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ServiceUnavailableError", "TimeoutError", "ConnectionError",
+}
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMCallCancelled(Exception):
+    """Raised inside a worker when its caller has given up on the call."""
+
+class LLMStreamInterrupted(Exception):
+    """A stream failed after yielding output; it is not retried, since the caller already has part of it."""
+
+_STREAM_END = object()
+CANCEL_POLL_SECONDS = 0.25  # How often a waiting stream checks its caller's cancel event
+
+def is_transient_error(error):
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES or status in TRANSIENT_STATUS_CODES
+
+class LLMClient:
+    """Bounded execution layer around a chat model such as the ChatGroq from setup_apis.
+
+    Calls run on a fixed-size thread pool, and at most `max_queue` more may wait, so the
+    thread count stays flat under load and excess calls fail fast. Each call carries a
+    deadline: queued calls that miss it never start, running calls stop retrying, and
+    transient errors are retried with jittered exponential backoff within the deadline.
+    The per-request HTTP timeout of the underlying client bounds how long an abandoned
+    in-flight request can hold its worker. Concurrent calls with the same prompt share
+    one upstream request, and its completion is reused for `coalesce_ttl` seconds.
+    """
+
+    def __init__(self, llm, max_workers=4, max_queue=16, max_retries=2, backoff_base=0.5, backoff_max=4.0, coalesce_ttl=30.0):
+        self.llm = llm
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._latencies = deque(maxlen=1000)
+        self._flights = SingleFlight(ttl=coalesce_ttl)
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "timeouts": 0, "rejected": 0, "retries": 0, "cancelled": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _run(self, call, deadline, cancelled):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            attempt = 0
+            while True:
+                if cancelled.is_set() or time.monotonic() >= deadline:
+                    self._count("cancelled")
+                    raise LLMCallCancelled()
+                try:
+                    return call()
+                except Exception as e:
+                    remaining = deadline - time.monotonic()
+                    if attempt >= self.max_retries or not is_transient_error(e) or remaining <= 0:
+                        raise
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                    print(f"LLM call failed with {type(e).__name__}, retrying in {delay:.2f}s")
+                    attempt += 1
+                    self._count("retries")
+                    if cancelled.wait(min(delay, remaining)):
+                        self._count("cancelled")
+                        raise LLMCallCancelled()
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def invoke(self, prompt, timeout=10):
+        """Return the completion text, or None if the call is rejected, fails or misses its deadline."""
+        try:
+            return self._flights.do(key_for(prompt), self._invoke, prompt, timeout, wait_timeout=timeout)
+        except TimeoutError:  # Waited out an identical call started before ours
+            self._count("timeouts")
+            increment("timeouts", operation="llm_call")
+            print(f"LLM invocation timed out after {timeout}s")
+            return None
+
+    def _admit(self):
+        """Reserve a queue slot for a new call, or count it as rejected and return False."""
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self.counters["rejected"] += 1
+                print("LLM call rejected: worker pool and queue are full")
+                increment("rejected", operation="llm_call")
+                return False
+            self._queued += 1
+            self.counters["calls"] += 1
+            return True
+
+    def _invoke(self, prompt, timeout):
+        start = time.monotonic()
+        deadline = start + timeout
+        if not self._admit():
+            return None
+        cancelled = threading.Event()
+        future = self._executor.submit(self._run, lambda: self.llm.invoke(prompt).content, deadline, cancelled)
+        try:
+            result = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            cancelled.set()
+            if future.cancel():  # Never started: release its queue slot
+                with self._lock:
+                    self._queued -= 1
+            self._count("timeouts")
+            increment("timeouts", operation="llm_call")
+            print(f"LLM invocation timed out after {timeout}s")
+            return None
+        except LLMCallCancelled:
+            self._count("timeouts")
+            increment("timeouts", operation="llm_call")
+            return None
+        except Exception as e:
+            self._count("failed")
+            increment("errors", operation="llm_call")
+            print(f"LLM invocation failed: {e}")
+            return None
+        self._succeeded(time.monotonic() - start, "llm_call")
+        return result
+
+    def _succeeded(self, latency, stage):
+        with self._lock:
+            self.counters["succeeded"] += 1
+            self._latencies.append(latency)
+        observe(stage, latency)
+
+    def stream(self, prompt, timeout=10, cancel=None):
+        """Yield completion text chunks as they arrive, within the same pool, queue and deadline as invoke.
+
+        Models without a `stream` method yield their whole completion as one chunk. The
+        stream just ends if the call is rejected, fails or misses its deadline, so callers
+        should check whether they got everything they need. Streams are not coalesced.
+        Setting `cancel` (a threading.Event) from another thread ends the stream and closes
+        the upstream model stream at its next chunk.
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        if not self._admit():
+            return
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+
+        def call():
+            if not hasattr(self.llm, "stream"):
+                chunks.put(self.llm.invoke(prompt).content)
+                return
+            received = False
+            upstream = self.llm.stream(prompt)
+            try:
+                for chunk in upstream:
+                    if cancelled.is_set() or (cancel is not None and cancel.is_set()):
+                        self._count("cancelled")
+                        raise LLMCallCancelled()
+                    text = getattr(chunk, "content", chunk)
+                    if text:
+                        received = True
+                        chunks.put(text)
+            except LLMCallCancelled:
+                raise
+            except Exception as e:
+                if received:
+                    raise LLMStreamInterrupted(f"{type(e).__name__}: {e}") from e
+                raise
+            finally:
+                close = getattr(upstream, "close", None)
+                if close is not None:
+                    close()
+
+        future = self._executor.submit(self._run, call, deadline, cancelled)
+        future.add_done_callback(lambda f: chunks.put(_STREAM_END))
+        try:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    return
+                remaining = deadline - time.monotonic()
+                try:
+                    item = chunks.get(timeout=max(min(remaining, CANCEL_POLL_SECONDS), 0))
+                except queue.Empty:
+                    if remaining > CANCEL_POLL_SECONDS:
+                        continue
+                    self._count("timeouts")
+                    increment("timeouts", operation="llm_stream")
+                    print(f"LLM stream timed out after {timeout}s")
+                    return
+                if item is not _STREAM_END:
+                    yield item
+                    continue
+                if future.cancelled() or isinstance(future.exception(), LLMCallCancelled):
+                    self._count("timeouts")
+                    increment("timeouts", operation="llm_stream")
+                elif future.exception() is not None:
+                    self._count("failed")
+                    increment("errors", operation="llm_stream")
+                    print(f"LLM stream failed: {future.exception()}")
+                else:
+                    self._succeeded(time.monotonic() - start, "llm_stream")
+                return
+        finally:
+            cancelled.set()
+            if future.cancel():  # Never started: release its queue slot
+                with self._lock:
+                    self._queued -= 1
+
+    def stats(self):
+        """Counters, current queue depth and in-flight calls, and latency percentiles in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self.counters, queue_depth=self._queued, in_flight=self._running)
+        stats.update({f"coalesced_{k}": v for k, v in self._flights.stats.items()})
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[f"latency_{name}"] = latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else None
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _client_gauge(field):
+    def read():
+        with _clients_lock:
+            clients = list(_clients.values())
+        return {(("client", str(i)),): client.stats()[field] for i, client in enumerate(clients)}
+    return read
+
+REGISTRY.register_gauge("llm_queue_depth", "LLM calls waiting for a worker.", _client_gauge("queue_depth"))
+REGISTRY.register_gauge("llm_in_flight", "LLM calls currently running.", _client_gauge("in_flight"))
+
+def get_llm_client(llm):
+    """Shared LLMClient for `llm`, configured from the LLM_* environment variables."""
+    if isinstance(llm, LLMClient):
+        return llm
+    with _clients_lock:
+        client = _clients.get(id(llm))
+        if client is None or client.llm is not llm:
+            client = LLMClient(
+                llm,
+                max_workers=int(os.getenv("LLM_MAX_WORKERS", "4")),
+                max_queue=int(os.getenv("LLM_MAX_QUEUE", "16")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+                coalesce_ttl=float(os.getenv("LLM_COALESCE_TTL", "30")),
+            )
+            _clients[id(llm)] = client
+        return client
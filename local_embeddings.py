@@ -0,0 +1,92 @@
+# local_embeddings.py
+import hashlib
+import os
+import re
+import zlib
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class HashingEmbeddingModel:
+    """Deterministic offline embeddings from hashed word and character n-grams.
+
+    Words, word bigrams and character trigrams are hashed into `dim` signed buckets
+    and the result is L2-normalized, so cosine similarity reflects shared vocabulary.
+    No model download or network access is needed.
+    """
+
+    def __init__(self, dim=512, char_ngram=3):
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.model = f"hashing-{dim}-c{char_ngram}"
+
+    def _features(self, text):
+        words = TOKEN_PATTERN.findall(str(text).lower())
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        n = self.char_ngram
+        for w in words:
+            padded = f"<{w}>"
+            features += [f"c:{padded[i:i + n]}" for i in range(max(len(padded) - n + 1, 1))]
+        return features
+
+    def embed_documents(self, texts, batch_size=32):
+        """Embed texts into an (N, dim) float32 matrix; `batch_size` is accepted for interface parity."""
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in self._features(text)), dtype=np.uint32)
+            if not len(hashes):
+                continue
+            buckets = (hashes % self.dim).astype(np.intp)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], buckets, signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0].tolist()
+
+def model_fingerprint(model_path):
+    """Short hash of the model directory's file names, sizes and mtimes; changes when the model is replaced."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(model_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            digest.update(f"{os.path.relpath(path, model_path)}\x00{st.st_size}\x00{st.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+class SentenceTransformerEmbeddingModel:
+    """In-process sentence-transformers model loaded from a local directory."""
+
+    def __init__(self, model_path):
+        from sentence_transformers import SentenceTransformer  # Optional dependency
+        # Also the embedding cache key, so it must tell apart models in same-named directories
+        self.model = f"sentence-transformers:{os.path.abspath(model_path)}:{model_fingerprint(model_path)}"
+        self._encoder = SentenceTransformer(model_path, device="cpu")
+
+    def embed_documents(self, texts, batch_size=32):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.asarray(
+            self._encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0].tolist()
+
+def load_local_embedding_model(model_path=None, dim=None):
+    """Return a sentence-transformers model if one is on disk, else the hashing vectorizer."""
+    model_path = model_path or os.getenv("LOCAL_EMBEDDING_MODEL")
+    if model_path and os.path.isdir(model_path):
+        try:
+            return SentenceTransformerEmbeddingModel(model_path)
+        except Exception as e:
+            print(f"❌ Local sentence-transformers model failed ({e}); using hashing embeddings")
+    dim = dim or int(os.getenv("HASHING_EMBEDDING_DIM", "512"))
+    return HashingEmbeddingModel(dim=dim)
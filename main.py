@@ -1,13 +1,50 @@
 # main.py
 import argparse
+import subprocess
+import sys
+import time
 from api_setup import setup_apis
 from db_setup import setup_database
 
+def startup_report(module="app", top=15):
+    """Print a `python -X importtime` breakdown of importing `module` in a fresh interpreter.
+
+    Lists the slowest modules imported at the top level or directly by `module`; returns
+    every (cumulative_us, self_us, depth, name) entry.
+    """
+    start_time = time.time()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    wall_time = time.time() - start_time
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # Nested imports are indented two spaces per level
+        imports.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    if result.returncode != 0:
+        print(f"Importing {module} failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}")
+    shown = [i for i in imports if i[2] <= 1]  # The module itself and what it imports directly
+    print(f"Startup report for '{module}' (interpreter + imports: {wall_time:.2f}s)")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, _, name in sorted(shown, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+    return imports
+
 def main():
     parser = argparse.ArgumentParser(description="Personalized Learning Companion Setup")
     parser.add_argument("--skip-apis", action="store_true", help="Skip API setup")
+    parser.add_argument("--startup-report", nargs="?", const="app", metavar="MODULE",
+                        help="Show an import-time breakdown for MODULE (default: app) and exit")
     args = parser.parse_args()
 
+    if args.startup_report:
+        startup_report(args.startup_report)
+        return
+
     print("=" * 50)
     print("Personalized Learning Companion - Initial Setup")
     print("=" * 50)
@@ -21,7 +58,9 @@ def main():
     embeddings = {}
     if not args.skip_apis:
         print("\nSetting up APIs...")
+        start_time = time.time()
         llms, embeddings = setup_apis()
+        print(f"API setup took {time.time() - start_time:.2f}s")
     else:
         print("\nSkipping API setup...")
 
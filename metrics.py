@@ -0,0 +1,169 @@
+# metrics.py
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "learning_companion"
+# Seconds; spans everything from a cache lookup to a slow LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HISTOGRAM_HELP = {
+    "stage_duration": "Time spent in each processing stage, such as document extraction or an LLM call, by stage.",
+    "request_duration": "Time to handle an HTTP request, by endpoint and method.",
+}
+
+COUNTER_HELP = {
+    "cache_hits": "Cache lookups served from cache, by cache.",
+    "cache_misses": "Cache lookups that had to compute or fetch, by cache.",
+    "timeouts": "Operations that missed their deadline, by operation.",
+    "fallbacks": "Responses that fell back to canned content, by kind.",
+    "errors": "Operations that failed, by operation.",
+    "rejected": "Calls rejected because the worker pool and queue were full, by operation.",
+}
+
+# Spans finished during the current request, for the Server-Timing header
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+class MetricsRegistry:
+    """Thread-safe in-process histograms and counters, rendered in Prometheus text format.
+
+    Stage durations go into one histogram family labelled by stage; counters are keyed by
+    name and a single label pair. Gauges are read from callbacks when rendering, so
+    components can expose their own state without pushing updates.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # name -> (help, callback returning {labels: value})
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.counts[index] += 1
+            histogram.total += seconds
+            histogram.count += 1
+
+    def increment(self, name, amount=1, **labels):
+        if not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_gauge(self, name, help_text, callback):
+        """Expose `callback()` ({label tuple: value}) as gauge `name` on every render."""
+        with self._lock:
+            self._gauges[name] = (help_text, callback)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = sorted((key, list(h.counts), h.total, h.count) for key, h in self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        seen = set()
+        for (name, labels), counts, total, count in histograms:
+            metric = f"{PREFIX}_{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} {HISTOGRAM_HELP.get(name, name.replace('_', ' ').capitalize() + ' in seconds.')}")
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name.replace('_', ' ').capitalize() + '.')}")
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for name, (help_text, callback) in gauges:
+            try:
+                values = callback()
+            except Exception as e:
+                print(f"Metrics gauge {name} failed: {e}")
+                continue
+            metric = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{metric}{_labels(labels)} {value if value is not None else 'NaN'}")
+        return "\n".join(lines) + "\n"
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+REGISTRY = MetricsRegistry()
+
+def observe(stage, seconds):
+    """Record a `stage` duration in the stage histogram and the current request's spans."""
+    REGISTRY.observe("stage_duration", seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+def increment(name, amount=1, **labels):
+    REGISTRY.increment(name, amount, **labels)
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as `stage`, whether it returns or raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def timed(stage):
+    """Decorator timing every call of the function as `stage`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_request_spans():
+    """Begin collecting spans for this request; returns a token for finish_request_spans."""
+    return _request_spans.set([])
+
+def finish_request_spans(token):
+    """Stop collecting and return the request's spans as {stage: (count, total seconds)}."""
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    totals = {}
+    for stage, seconds in spans:
+        count, total = totals.get(stage, (0, 0.0))
+        totals[stage] = (count + 1, total + seconds)
+    return totals
+
+def server_timing(totals):
+    """Server-Timing header value for finish_request_spans output (durations in milliseconds)."""
+    return ", ".join(f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (count, total) in totals.items())
@@ -0,0 +1,162 @@
+# mind_map.py
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+from metrics import span, increment
+
+DEFAULT_MIND_MAP_DIR = "static/mind_maps"
+MAX_MIND_MAP_FILES = 500
+
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="640" height="120" viewBox="0 0 640 120">'
+    '<rect width="640" height="120" rx="8" fill="#f8f9fa"/>'
+    '<text x="320" y="66" text-anchor="middle" font-family="sans-serif" font-size="18" fill="#6c757d">'
+    'Rendering mind map&#8230;</text></svg>'
+)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mind-map")
+_pending = {}
+_pending_lock = threading.Lock()
+
+def mind_map_dir():
+    return os.getenv("MIND_MAP_DIR", DEFAULT_MIND_MAP_DIR)
+
+def mind_map_format():
+    return "png" if os.getenv("MIND_MAP_FORMAT", "svg").lower() == "png" else "svg"
+
+def mind_map_key(topic, concepts):
+    """Content address of a mind map: the same topic and concepts, in any order, share one file."""
+    digest = hashlib.sha256()
+    digest.update(" ".join(topic.lower().split()).encode("utf-8"))
+    for concept in sorted(concepts):
+        digest.update(b"\x00")
+        digest.update(concept.encode("utf-8"))
+    digest.update(mind_map_format().encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+def mind_map_path(key):
+    return os.path.join(mind_map_dir(), f"{key}.{mind_map_format()}")
+
+def star_layout(count, width=800, height=600, margin=110):
+    """Root at the centre and `count` concepts evenly spaced on an ellipse around it."""
+    cx, cy = width / 2, height / 2
+    rx, ry = cx - margin, cy - margin * 0.6
+    return (cx, cy), [
+        (cx + rx * math.cos(2 * math.pi * i / count - math.pi / 2), cy + ry * math.sin(2 * math.pi * i / count - math.pi / 2))
+        for i in range(count)
+    ]
+
+def render_mind_map_svg(topic, concepts, width=800, height=600):
+    concepts = sorted(concepts)
+    (cx, cy), points = star_layout(len(concepts), width, height) if concepts else ((width / 2, height / 2), [])
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        'font-family="sans-serif" font-weight="bold" text-anchor="middle">',
+        f'<text x="{width / 2:.0f}" y="28" font-size="18">Mind Map for {escape(topic)}</text>',
+    ]
+    for x, y in points:
+        parts.append(f'<line x1="{cx:.1f}" y1="{cy:.1f}" x2="{x:.1f}" y2="{y:.1f}" stroke="#555" stroke-width="1.5"/>')
+    for label, (x, y), radius in [(topic, (cx, cy), 52)] + [(c, p, 44) for c, p in zip(concepts, points)]:
+        parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{radius}" fill="#add8e6"/>')
+        parts.append(f'<text x="{x:.1f}" y="{y + 4:.1f}" font-size="12">{escape(label)}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+def render_mind_map_png(topic, concepts, path):
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-GUI backend
+    import matplotlib.pyplot as plt
+
+    concepts = sorted(concepts)
+    (cx, cy), points = star_layout(len(concepts)) if concepts else ((400, 300), [])
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for x, y in points:
+        ax.plot([cx, x], [cy, y], color="#555555", zorder=1)
+    ax.scatter([cx] + [x for x, _ in points], [cy] + [y for _, y in points], s=2000, color="lightblue", zorder=2)
+    for label, (x, y) in [(topic, (cx, cy))] + list(zip(concepts, points)):
+        ax.text(x, y, label, ha="center", va="center", fontsize=10, fontweight="bold", zorder=3)
+    ax.set_title(f"Mind Map for {topic}")
+    ax.invert_yaxis()
+    ax.axis("off")
+    fig.savefig(path, format="png", bbox_inches='tight')
+    plt.close(fig)  # Always close the figure
+
+def evict_mind_maps(max_files=None):
+    """Delete the least recently used mind maps beyond `max_files` (MIND_MAP_MAX_FILES)."""
+    max_files = max_files if max_files is not None else int(os.getenv("MIND_MAP_MAX_FILES", str(MAX_MIND_MAP_FILES)))
+    directory = mind_map_dir()
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and not e.name.startswith(".")]
+    except FileNotFoundError:
+        return 0
+    if len(entries) <= max_files:
+        return 0
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    removed = 0
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def render_mind_map(topic, concepts):
+    """Render the mind map to its content-addressed file unless it already exists; returns the key.
+
+    Existing files are touched on reuse so eviction drops the least recently used ones.
+    Files are written under a temporary name and renamed, so readers never see a partial image.
+    """
+    key = mind_map_key(topic, concepts)
+    path = mind_map_path(key)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # Evicted in between; render it again
+            pass
+        else:
+            increment("cache_hits", cache="mind_map")
+            return key
+    increment("cache_misses", cache="mind_map")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{key}.{threading.get_ident()}.tmp")
+    with span("mind_map_render"):
+        if mind_map_format() == "png":
+            render_mind_map_png(topic, concepts, tmp_path)
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(render_mind_map_svg(topic, concepts))
+        os.replace(tmp_path, path)
+    evict_mind_maps()
+    return key
+
+def request_mind_map(topic, concepts):
+    """Return the mind map key right away, rendering it in the background if it is missing."""
+    key = mind_map_key(topic, concepts)
+    if os.path.exists(mind_map_path(key)):
+        return render_mind_map(topic, concepts)  # Cache hit: only touches the file
+    with _pending_lock:
+        if key in _pending:
+            return key
+        future = _pending[key] = _executor.submit(render_mind_map, topic, concepts)
+    future.add_done_callback(lambda f: _discard_pending(key))  # Outside the lock: may run immediately
+    return key
+
+def _discard_pending(key):
+    with _pending_lock:
+        _pending.pop(key, None)
+
+def wait_for_mind_map(key, timeout=2.0):
+    """Path of the rendered mind map, waiting up to `timeout` for a pending render; None if not ready."""
+    with _pending_lock:
+        future = _pending.get(key)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            print(f"Mind map not ready: {type(e).__name__} {e}")
+    path = mind_map_path(key)
+    return path if os.path.exists(path) else None
@@ -0,0 +1,67 @@
+# prefetch.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from question_bank import refill_pool, corpus_version
+from vector_index import get_vector_index, retrieve_context
+
+# Follow-up difficulty depends on the baseline score, so warm every band above "basic";
+# the basic pool is already being refilled by the baseline itself.
+FOLLOW_UP_DIFFICULTIES = ("intermediate", "advanced")
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _prefetch_follow_up(published, llm, embedding_model, topic, concepts, content):
+    try:
+        context = retrieve_context(get_vector_index(), embedding_model, concepts, filenames=list(content)) if content else ""
+        version = corpus_version(content)
+    except Exception as e:
+        published.set_exception(e)
+        raise
+    # The follow-up phase only needs these; it doesn't wait for the refills below
+    published.set_result({"concepts": list(concepts), "context": context})
+    for difficulty in FOLLOW_UP_DIFFICULTIES:
+        try:
+            added = refill_pool(llm, topic, concepts, difficulty, version, context=context)
+            print(f"Prefetched {added} {difficulty} follow-up questions for '{topic}'")
+        except Exception as e:
+            print(f"Follow-up prefetch ({difficulty}) for '{topic}' failed: {e}")
+
+def start_follow_up_prefetch(key, llm, embedding_model, topic, concepts, content):
+    """Start warming follow-up questions for `concepts` in the background.
+
+    The job retrieves the prompt context once and banks questions at every follow-up
+    difficulty, so the follow-up phase can be served straight from the question bank.
+    `key` identifies the learner's run; only the key needs to be kept in session state.
+    """
+    with _jobs_lock:
+        if key in _jobs:
+            return key
+        published = Future()
+        job = _executor.submit(_prefetch_follow_up, published, llm, embedding_model, topic, concepts, content)
+        _jobs[key] = (job, published)
+    return key
+
+def take_follow_up_prefetch(key, timeout=10.0):
+    """Pop the concepts and context prefetched for `key`, waiting up to `timeout` for them.
+
+    Only the context retrieval is waited for, not the question refills that follow it.
+    Returns None if there is no job or it failed or timed out; questions the job banks
+    afterwards are still picked up by the question bank.
+    """
+    with _jobs_lock:
+        job, published = _jobs.pop(key, (None, None))
+    if published is None:
+        return None
+    try:
+        return published.result(timeout=timeout)
+    except Exception as e:
+        print(f"Follow-up prefetch not used: {type(e).__name__} {e}")
+        return None
+
+def discard_follow_up_prefetch(key):
+    with _jobs_lock:
+        job, published = _jobs.pop(key, (None, None))
+    if job is not None:
+        job.cancel()
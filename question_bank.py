@@ -0,0 +1,263 @@
+# question_bank.py
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from db_setup import setup_database, BankedQuestion, SeenQuestion
+from metrics import timed, increment
+from learning_assessment import generate_questions_from_concepts, stream_questions_from_concepts, difficulty_for_score
+
+POOL_TARGET = 6  # Questions to keep banked per (topic, concept, difficulty, corpus version)
+REFILL_BATCH = 4
+DIFFICULTY_SCORES = {"basic": 0, "intermediate": 60, "advanced": 90}
+
+_refill_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-refill")
+_refills_in_flight = set()
+_refills_lock = threading.Lock()
+
+def normalize_topic(topic):
+    return " ".join(topic.lower().split())
+
+def corpus_version(content):
+    """Short hash identifying the documents questions were generated from."""
+    digest = hashlib.sha256()
+    if not content:
+        return "none"
+    store = getattr(content, "store", None)
+    if store is not None:
+        versions = store.versions()
+        for name in sorted(content):
+            digest.update(f"{name}\x00{versions.get(name, '')}\n".encode("utf-8"))
+    else:
+        for name in sorted(content):
+            digest.update(f"{name}\x00".encode("utf-8"))
+            digest.update(content[name].encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def concept_for_question(question, concepts, topic=None):
+    """The concept a generated question is about: the first one it names, else the best word overlap.
+
+    Falls back to `topic` when there are no concepts.
+    """
+    if not concepts:
+        return topic
+    text = question.lower()
+    for concept in concepts:
+        if concept.lower() in text:
+            return concept
+    words = set(text.split())
+    return max(concepts, key=lambda c: len(words & set(c.lower().split())))
+
+def _to_question(row):
+    return {"question": row.question, "options": json.loads(row.options), "correct": row.correct, "bank_id": row.id}
+
+def question_refs(questions):
+    """Compact form of served questions for session state: banked ones by id only."""
+    return [{"bank_id": q["bank_id"]} if "bank_id" in q else q for q in questions]
+
+def resolve_questions(refs):
+    """Expand question_refs output back into full questions."""
+    ids = [r["bank_id"] for r in refs if set(r) == {"bank_id"}]
+    if not ids:
+        return list(refs)
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        rows = {row.id: _to_question(row) for row in session.query(BankedQuestion).filter(BankedQuestion.id.in_(ids))}
+    finally:
+        session.close()
+    resolved = []
+    for ref in refs:
+        if set(ref) != {"bank_id"}:
+            resolved.append(ref)
+        elif ref["bank_id"] in rows:
+            resolved.append(rows[ref["bank_id"]])
+    return resolved
+
+@timed("db_write")
+def bank_questions(questions, topic, concepts, difficulty, version):
+    """Store validated LLM questions in the bank, skipping fallbacks and duplicates.
+
+    Returns the stored questions with their `bank_id` set.
+    """
+    engine, Session = setup_database()
+    session = Session()
+    topic_key = normalize_topic(topic)
+    stored = []
+    try:
+        for q in questions:
+            if q.get("fallback"):
+                continue
+            row = BankedQuestion(
+                topic=topic_key, concept=concept_for_question(q["question"], concepts, topic_key), difficulty=difficulty,
+                corpus_version=version, question=q["question"], options=json.dumps(q["options"]), correct=q["correct"],
+            )
+            session.add(row)
+            try:
+                session.commit()
+            except IntegrityError:  # Already banked, e.g. by a concurrent refill
+                session.rollback()
+                row = session.query(BankedQuestion).filter_by(
+                    topic=topic_key, difficulty=difficulty, corpus_version=version, question=q["question"]
+                ).first()
+                if row is None:
+                    continue
+            stored.append(dict(q, bank_id=row.id))
+    finally:
+        session.close()
+    return stored
+
+def pool_sizes(topic, concepts, difficulty, version):
+    """{concept: banked question count} for the given pool."""
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        rows = session.query(BankedQuestion.concept).filter(
+            BankedQuestion.topic == normalize_topic(topic),
+            BankedQuestion.difficulty == difficulty,
+            BankedQuestion.corpus_version == version,
+            BankedQuestion.concept.in_(concepts),
+        ).all()
+    finally:
+        session.close()
+    sizes = dict.fromkeys(concepts, 0)
+    for (concept,) in rows:
+        sizes[concept] += 1
+    return sizes
+
+def refill_pool(llm, topic, concepts, difficulty, version, context=None):
+    """Generate and bank a batch of questions for concepts whose pools are low."""
+    low = [c for c, n in pool_sizes(topic, concepts, difficulty, version).items() if n < POOL_TARGET]
+    if not low:
+        return 0
+    questions, _ = generate_questions_from_concepts(
+        llm, low, topic, DIFFICULTY_SCORES[difficulty], num_questions=REFILL_BATCH, context=context
+    )
+    return len(bank_questions(questions, topic, low, difficulty, version))
+
+def schedule_refill(llm, topic, concepts, difficulty, version, context=None):
+    """Refill low pools on a background thread, at most one refill per pool at a time."""
+    key = (normalize_topic(topic), tuple(sorted(concepts)), difficulty, version)
+    with _refills_lock:
+        if key in _refills_in_flight:
+            return None
+        _refills_in_flight.add(key)
+
+    def run():
+        try:
+            added = refill_pool(llm, topic, concepts, difficulty, version, context=context)
+            print(f"Question bank refill for '{topic}' ({difficulty}) added {added} questions")
+        except Exception as e:
+            print(f"Question bank refill for '{topic}' failed: {e}")
+        finally:
+            with _refills_lock:
+                _refills_in_flight.discard(key)
+    return _refill_executor.submit(run)
+
+@timed("db_write")
+def mark_seen(user_name, bank_ids):
+    if not user_name or not bank_ids:
+        return
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        seen = {qid for (qid,) in session.query(SeenQuestion.question_id).filter(
+            SeenQuestion.user_name == user_name, SeenQuestion.question_id.in_(bank_ids)
+        )}
+        session.add_all(SeenQuestion(user_name=user_name, question_id=qid) for qid in set(bank_ids) - seen)
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+    finally:
+        session.close()
+
+def banked_questions(concepts, topic, difficulty, version, num_questions, used_questions, user_name=None):
+    """Up to `num_questions` unseen banked questions, spread across concepts round-robin."""
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        query = session.query(BankedQuestion).filter(
+            BankedQuestion.topic == normalize_topic(topic),
+            BankedQuestion.difficulty == difficulty,
+            BankedQuestion.corpus_version == version,
+            BankedQuestion.concept.in_(concepts),
+        )
+        if user_name:
+            seen = session.query(SeenQuestion.question_id).filter(SeenQuestion.user_name == user_name)
+            query = query.filter(~BankedQuestion.id.in_(seen))
+        by_concept = {c: [] for c in concepts}
+        for row in query.order_by(BankedQuestion.id):
+            if row.question not in used_questions:
+                by_concept[row.concept].append(_to_question(row))
+    finally:
+        session.close()
+
+    questions = []
+    while len(questions) < num_questions and any(by_concept.values()):
+        for concept in concepts:
+            if by_concept[concept] and len(questions) < num_questions:
+                questions.append(by_concept[concept].pop(0))
+    print(f"Question bank served {len(questions)}/{num_questions} questions for '{topic}' ({difficulty})")
+    increment("cache_hits", len(questions), cache="question_bank")
+    increment("cache_misses", num_questions - len(questions), cache="question_bank")
+    return questions
+
+def serve_questions(llm, concepts, topic, score, num_questions=2, used_questions=None, user_name=None, content=None, context=None):
+    """Serve quiz questions from the bank, falling back to the LLM when the pool is short.
+
+    Questions the user has already seen (by name) or that are in `used_questions` are
+    excluded, and questions are spread across concepts round-robin. Newly generated
+    questions are banked, and pools that run low are refilled in the background.
+    Returns (questions, used_questions) like generate_questions_from_concepts.
+    """
+    if used_questions is None:
+        used_questions = set()
+    difficulty = difficulty_for_score(score)
+    version = corpus_version(content)
+    questions = banked_questions(concepts, topic, difficulty, version, num_questions, used_questions, user_name)
+
+    if len(questions) < num_questions:
+        generated, _ = generate_questions_from_concepts(
+            llm, concepts, topic, score, num_questions=num_questions - len(questions),
+            used_questions=used_questions | {q["question"] for q in questions}, context=context,
+        )
+        stored = {q["question"]: q for q in bank_questions(generated, topic, concepts, difficulty, version)}
+        questions.extend(stored.get(q["question"], q) for q in generated)
+
+    for q in questions:
+        used_questions.add(q["question"])
+    mark_seen(user_name, [q["bank_id"] for q in questions if "bank_id" in q])
+    schedule_refill(llm, topic, concepts, difficulty, version, context=context)
+    return questions[:num_questions], used_questions
+
+def stream_questions(llm, concepts, topic, score, num_questions=2, used_questions=None, user_name=None, content=None, context=None, cancel=None):
+    """Streaming counterpart of serve_questions: yields banked questions first, then each
+    generated question as soon as the model has written it, banking it on the way.
+
+    `used_questions` is updated as questions are yielded; `cancel` is passed on to
+    stream_questions_from_concepts.
+    """
+    if used_questions is None:
+        used_questions = set()
+    difficulty = difficulty_for_score(score)
+    version = corpus_version(content)
+    questions = banked_questions(concepts, topic, difficulty, version, num_questions, used_questions, user_name)
+    mark_seen(user_name, [q["bank_id"] for q in questions])
+    for q in questions:
+        used_questions.add(q["question"])
+        yield q
+
+    if len(questions) < num_questions:
+        for q in stream_questions_from_concepts(
+            llm, concepts, topic, score, num_questions=num_questions - len(questions),
+            used_questions=used_questions, context=context, cancel=cancel,
+        ):
+            stored = bank_questions([q], topic, concepts, difficulty, version)
+            if stored:
+                q = stored[0]
+                mark_seen(user_name, [q["bank_id"]])
+            yield q
+    if cancel is not None and cancel.is_set():
+        return
+    schedule_refill(llm, topic, concepts, difficulty, version, context=context)
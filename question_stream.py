@@ -0,0 +1,115 @@
+# question_stream.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Streams held open at once; further learners are served without streaming instead of queueing
+STREAM_WORKERS = int(os.getenv("QUESTION_STREAM_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="question-stream")
+_streams = {}
+_streams_lock = threading.Lock()
+_active = 0
+
+class QuestionStream:
+    """Drains a question generator on a background thread so requests can pick up
+    questions as they become ready instead of waiting for the whole batch."""
+
+    def __init__(self, make_questions):
+        self._cancel = threading.Event()
+        self._questions = make_questions(self._cancel)
+        self._items = []
+        self._done = False
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _drain(self):
+        try:
+            for question in self._questions:
+                with self._condition:
+                    if self._closed:
+                        break
+                    self._items.append(question)
+                    self._condition.notify_all()
+        except Exception as e:
+            print(f"Question stream failed: {type(e).__name__} {e}")
+        finally:
+            self._questions.close()
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+            _release_worker()
+
+    def take(self, start, timeout):
+        """Questions after the first `start`, waiting up to `timeout` for at least one.
+
+        Returns an empty list once the stream is finished or the wait times out.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while len(self._items) <= start and not self._done:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return list(self._items[start:])
+
+    @property
+    def done(self):
+        with self._condition:
+            return self._done
+
+    def close(self):
+        """Stop the stream, cancelling the model call behind it rather than letting it run on."""
+        self._cancel.set()
+        with self._condition:
+            self._closed = True
+
+def _release_worker():
+    global _active
+    with _streams_lock:
+        _active -= 1
+
+def start_question_stream(key, make_questions):
+    """Start draining questions for the learner's run identified by `key`.
+
+    `make_questions(cancel)` returns the question generator; `cancel` is a threading.Event
+    set when the stream is closed, which the generator should pass on to the model call.
+    Returns None when every stream worker is busy, so the caller can serve the batch some
+    other way rather than wait for a free worker.
+    """
+    global _active
+    with _streams_lock:
+        if _active >= STREAM_WORKERS:
+            return None
+        _active += 1
+    stream = QuestionStream(make_questions)
+    with _streams_lock:
+        previous = _streams.pop(key, None)
+        _streams[key] = stream
+    if previous is not None:
+        previous.close()
+    _executor.submit(stream._drain)
+    return stream
+
+def take_streamed_questions(key, start, timeout=15.0):
+    """Questions of stream `key` after the first `start` (see QuestionStream.take).
+
+    Returns None if the stream isn't running in this process (e.g. it was started by
+    another worker process).
+    """
+    with _streams_lock:
+        stream = _streams.get(key)
+    if stream is None:
+        return None
+    questions = stream.take(start, timeout)
+    if not questions and stream.done:
+        discard_question_stream(key)
+    return questions
+
+def discard_question_stream(key):
+    with _streams_lock:
+        stream = _streams.pop(key, None)
+    if stream is not None:
+        stream.close()
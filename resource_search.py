@@ -0,0 +1,158 @@
+# resource_search.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from metrics import span, increment
+
+class DuckDuckGoProvider:
+    """Web search through duckduckgo_search, returning raw {title, href, body} results."""
+
+    def search(self, query, max_results=3):
+        from duckduckgo_search import DDGS
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, region="us-en", safesearch="moderate", max_results=max_results))
+
+class LocalSearchProvider:
+    """Offline stand-in for tests and benchmarks: canned results after an optional delay."""
+
+    def __init__(self, results=None, latency=0.0):
+        self.results = results
+        self.latency = latency
+        self.queries = []
+
+    def search(self, query, max_results=3):
+        self.queries.append(query)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.results is not None:
+            return list(self.results)[:max_results]
+        return [
+            {"title": f"{query} ({i + 1})", "href": f"https://example.com/search/{i + 1}", "body": f"Local result {i + 1} for {query}"}
+            for i in range(max_results)
+        ]
+
+class ResourceCache:
+    """TTL cache for resource searches with stale-while-revalidate and a strict deadline.
+
+    Fresh entries are returned as is. Entries older than `ttl` but younger than `stale_ttl`
+    are returned immediately while one background refresh runs. Misses wait for the
+    search at most `deadline` seconds, then get the caller's fallback; the search keeps
+    running and fills the cache for the next visit.
+    """
+
+    def __init__(self, ttl=3600, stale_ttl=86400, deadline=1.5, max_entries=1024, max_workers=2):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.deadline = deadline
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resource-search")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (fetched_at, results)
+        self._refreshing = {}  # key -> Future
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "timeouts": 0, "failures": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        if name in ("hits", "stale"):
+            increment("cache_hits", cache="resource_search")
+        elif name == "misses":
+            increment("cache_misses", cache="resource_search")
+        elif name == "timeouts":
+            increment("timeouts", operation="web_search")
+        elif name == "failures":
+            increment("errors", operation="web_search")
+
+    def _store(self, key, results):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, fetch):
+        try:
+            with span("web_search"):
+                results = fetch()
+            if results:
+                self._store(key, results)
+            return results
+        except Exception as e:
+            self._count("failures")
+            print(f"Resource search failed: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+    def refresh(self, key, fetch):
+        """Start a background search for `key` unless one is already running; returns its future."""
+        with self._lock:
+            future = self._refreshing.get(key)
+            if future is None:
+                future = self._refreshing[key] = self._executor.submit(self._refresh, key, fetch)
+        return future
+
+    def prefetch(self, key, fetch):
+        """Warm `key` in the background if it is missing or no longer fresh."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.refresh(key, fetch)
+
+    def get(self, key, fetch, fallback, deadline=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.stale_ttl:
+                self._entries.move_to_end(key)
+        if entry is not None and now - entry[0] <= self.ttl:
+            self._count("hits")
+            return entry[1]
+        if entry is not None and now - entry[0] <= self.stale_ttl:
+            self._count("stale")
+            self.refresh(key, fetch)
+            return entry[1]
+
+        self._count("misses")
+        future = self.refresh(key, fetch)
+        try:
+            results = future.result(timeout=self.deadline if deadline is None else deadline)
+        except FutureTimeoutError:
+            self._count("timeouts")
+            print("Resource search missed its deadline, using fallback results")
+            return fallback()
+        except Exception:
+            return fallback()
+        return results or fallback()
+
+_provider = None
+_cache = None
+_lock = threading.Lock()
+
+def set_search_provider(provider):
+    """Plug in a search provider (anything with `search(query, max_results)`), e.g. LocalSearchProvider."""
+    global _provider
+    _provider = provider
+
+def get_search_provider():
+    """The configured provider: SEARCH_PROVIDER=local selects LocalSearchProvider, else DuckDuckGo."""
+    global _provider
+    with _lock:
+        if _provider is None:
+            _provider = LocalSearchProvider() if os.getenv("SEARCH_PROVIDER", "").lower() == "local" else DuckDuckGoProvider()
+        return _provider
+
+def get_resource_cache():
+    """Shared ResourceCache, configured from SEARCH_CACHE_TTL, SEARCH_STALE_TTL and SEARCH_DEADLINE."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResourceCache(
+                ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+                stale_ttl=float(os.getenv("SEARCH_STALE_TTL", "86400")),
+                deadline=float(os.getenv("SEARCH_DEADLINE", "1.5")),
+            )
+        return _cache
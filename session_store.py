@@ -0,0 +1,106 @@
+# session_store.py
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_SESSION_DB = "data/sessions.db"
+
+def new_session_id():
+    return secrets.token_urlsafe(24)
+
+def encode_state(state):
+    """Serialize learner state to JSON; sets become sorted lists."""
+    return json.dumps(state, default=lambda o: sorted(o) if isinstance(o, set) else str(o))
+
+class MemorySessionStore:
+    """Per-process session store with a TTL and LRU eviction beyond `max_entries`.
+
+    Values are stored encoded, so callers always get a private copy, the same as the
+    SQLite backend.
+    """
+
+    def __init__(self, ttl=3600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # sid -> (expires_at, encoded state)
+
+    def get(self, sid):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            if item[0] <= now:
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return json.loads(item[1])
+
+    def set(self, sid, state):
+        encoded = encode_state(state)
+        with self._lock:
+            self._data[sid] = (time.time() + self.ttl, encoded)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+class SQLiteSessionStore:
+    """Session store in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path=DEFAULT_SESSION_DB, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, expires_at REAL NOT NULL, state TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions(expires_at)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        row = self._conn().execute(
+            "SELECT state FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, sid, state):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (sid, now + self.ttl, encode_state(state)))
+        # Expired sessions are swept opportunistically on a small fraction of writes
+        if secrets.randbelow(100) == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.commit()
+
+    def delete(self, sid):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        conn.commit()
+
+def create_session_store(backend=None):
+    """Session store chosen by SESSION_BACKEND ("memory" or "sqlite") with SESSION_TTL seconds."""
+    backend = (backend or os.getenv("SESSION_BACKEND", "memory")).lower()
+    ttl = int(os.getenv("SESSION_TTL", "3600"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", DEFAULT_SESSION_DB), ttl=ttl)
+    return MemorySessionStore(ttl=ttl, max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000")))
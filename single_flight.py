@@ -0,0 +1,81 @@
+# single_flight.py
+import hashlib
+import threading
+import time
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one upstream call.
+
+    The first caller for a key runs the function; callers arriving while it is in flight
+    wait for and share its result (or exception). Successful results are kept for
+    `ttl` seconds so callers right behind the stampede are served too.
+    """
+
+    def __init__(self, ttl=30.0, max_results=1024):
+        self.ttl = ttl
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._results = {}  # key -> (expires_at, result)
+        self.stats = {"leader": 0, "shared": 0, "cached": 0}
+
+    def do(self, key, fn, *args, wait_timeout=None, **kwargs):
+        """Run `fn(*args, **kwargs)` for `key`, or share the result of the call already in flight.
+
+        A caller sharing another's call waits at most `wait_timeout` seconds (forever by
+        default) and then raises TimeoutError; the call itself carries on for the rest.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > now:
+                self.stats["cached"] += 1
+                return cached[1]
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.stats["leader"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            if not call.event.wait(wait_timeout):
+                raise TimeoutError(f"identical call still in flight after {wait_timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if call.error is None and call.result is not None and self.ttl > 0:
+                    self._remember(key, call.result, time.monotonic())
+            call.event.set()
+        return call.result
+
+    def _remember(self, key, result, now):
+        if len(self._results) >= self.max_results:
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+            while len(self._results) >= self.max_results:
+                self._results.pop(next(iter(self._results)))
+        self._results[key] = (now + self.ttl, result)
+
+def key_for(*parts):
+    """Stable hash key for a call's inputs."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
@@ -0,0 +1,79 @@
+# test_embedding_cache.py
+import threading
+import time
+import numpy as np
+from embedding_cache import CachedEmbeddingModel
+
+class SlowModel:
+    """Records every text sent upstream; holds each batch long enough for callers to overlap."""
+
+    def __init__(self, delay=0.3, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts, batch_size=32):
+        with self._lock:
+            self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [[float(len(t)), float(sum(map(ord, t)))] for t in texts]
+
+    def sent(self):
+        return [t for batch in self.batches for t in batch]
+
+def run_concurrently(*calls):
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+
+    def run(i, call):
+        try:
+            results[i] = call()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)  # The first caller is in flight before the next arrives
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def test_identical_batches_share_one_upstream_call():
+    model = SlowModel()
+    cache = CachedEmbeddingModel(model)
+    results, errors = run_concurrently(lambda: cache.embed_documents(["alpha", "beta"]), lambda: cache.embed_documents(["alpha", "beta"]))
+    assert errors == [None, None]
+    assert len(model.batches) == 1
+    np.testing.assert_array_equal(results[0], results[1])
+    assert cache.cache_info()["coalesced"] == 2
+
+def test_overlapping_batches_fetch_each_text_once():
+    model = SlowModel()
+    cache = CachedEmbeddingModel(model)
+    results, errors = run_concurrently(lambda: cache.embed_documents(["alpha", "beta"]), lambda: cache.embed_documents(["beta", "gamma"]))
+    assert errors == [None, None]
+    assert sorted(model.sent()) == ["alpha", "beta", "gamma"]
+    np.testing.assert_array_equal(results[0][1], results[1][0])
+    assert cache.cache_info()["coalesced"] == 1
+
+def test_waiting_callers_share_the_upstream_error():
+    model = SlowModel(fail=True)
+    cache = CachedEmbeddingModel(model)
+    results, errors = run_concurrently(lambda: cache.embed_documents(["alpha"]), lambda: cache.embed_documents(["alpha", "beta"]))
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert model.sent().count("alpha") == 1
+    # Nothing stays in flight, so a later call retries upstream
+    model.fail = False
+    assert cache.embed_documents(["alpha"]).shape == (1, 2)
+
+def test_sequential_calls_are_served_from_memory():
+    model = SlowModel(delay=0)
+    cache = CachedEmbeddingModel(model)
+    cache.embed_documents(["alpha", "beta"])
+    cache.embed_documents(["Alpha ", "beta"])
+    assert model.sent() == ["alpha", "beta"]
+    assert cache.cache_info()["memory_hits"] == 2
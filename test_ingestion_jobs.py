@@ -0,0 +1,129 @@
+# test_ingestion_jobs.py
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+import db_setup
+import ingestion_jobs
+from db_setup import setup_database, IngestionJob
+from ingestion_jobs import IngestionQueue, STALE_AFTER
+
+# Each thread acts as the process named in identity.owner
+identity = threading.local()
+
+class RecordingExecutor:
+    """Stands in for the queue's executor: records submitted jobs instead of running them."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, job_id):
+        self.submitted.append(job_id)
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(db_setup, "DATABASE_URL", f"sqlite:///{tmp_path / 'jobs.db'}")
+    monkeypatch.setattr(ingestion_jobs, "_owner", lambda: getattr(identity, "owner", "worker-a:1"))
+
+def add_job(job_id, status, owner, heartbeat_at):
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        session.add(IngestionJob(id=job_id, status=status, owner=owner, heartbeat_at=heartbeat_at))
+        session.commit()
+    finally:
+        session.close()
+
+def get_job(job_id):
+    engine, Session = setup_database()
+    session = Session()
+    try:
+        return session.get(IngestionJob, job_id)
+    finally:
+        session.close()
+
+def make_queue(calls):
+    def ingest(progress):
+        calls.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return ["notes.txt"]
+    queue = IngestionQueue(ingest)
+    queue._executor = RecordingExecutor()
+    return queue
+
+def in_threads(*targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_racing_claimers_run_a_job_once():
+    calls = []
+    queue = make_queue(calls)
+    add_job("job", "queued", "worker-a:1", datetime.now())
+    in_threads(*[lambda: queue._run("job") for _ in range(8)])
+    assert len(calls) == 1
+    assert get_job("job").status == "done"
+
+def test_stale_heartbeat_is_taken_over():
+    calls = []
+    queue = make_queue(calls)
+    add_job("job", "running", "worker-b:2", datetime.now() - STALE_AFTER - timedelta(seconds=5))
+    queue._recover()
+    assert queue._executor.submitted == ["job"]
+    job = get_job("job")
+    assert (job.status, job.owner) == ("queued", "worker-a:1")
+    queue._run("job")
+    assert len(calls) == 1
+    assert get_job("job").status == "done"
+
+def test_live_heartbeat_is_not_taken_over():
+    calls = []
+    queue = make_queue(calls)
+    heartbeat = datetime.now()
+    add_job("job", "running", "worker-b:2", heartbeat)
+    queue._recover()
+    queue._run("job")  # A stray submission must not run it either
+    assert queue._executor.submitted == []
+    assert calls == []
+    job = get_job("job")
+    assert (job.status, job.owner, job.heartbeat_at) == ("running", "worker-b:2", heartbeat)
+
+class BarrierStaleAfter:
+    """STALE_AFTER that makes every process wait, after reading the pending jobs, until all have read them."""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+
+    def __rsub__(self, now):
+        self.barrier.wait()
+        return now - STALE_AFTER
+
+def test_only_one_process_takes_over_a_stale_job(monkeypatch):
+    queues = {owner: make_queue([]) for owner in ("worker-a:1", "worker-c:3", "worker-d:4")}
+    add_job("job", "queued", "worker-b:2", datetime.now() - STALE_AFTER - timedelta(seconds=5))
+    monkeypatch.setattr(ingestion_jobs, "STALE_AFTER", BarrierStaleAfter(len(queues)))
+
+    def recover_as(owner):
+        def run():
+            identity.owner = owner
+            queues[owner]._recover()
+        return run
+
+    in_threads(*[recover_as(owner) for owner in queues])
+    winners = [owner for owner, queue in queues.items() if queue._executor.submitted == ["job"]]
+    assert len(winners) == 1
+    assert get_job("job").owner == winners[0]
+
+@pytest.mark.skipif(sys.platform == "win32", reason="exited owners are only detected on POSIX")
+def test_job_of_an_exited_process_is_taken_over_before_going_stale():
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    queue = make_queue([])
+    add_job("job", "running", f"{socket.gethostname()}:{exited.pid}", datetime.now())
+    queue._recover()
+    assert queue._executor.submitted == ["job"]
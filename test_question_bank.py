@@ -0,0 +1,36 @@
+# test_question_bank.py
+import db_setup
+from learning_assessment import extract_key_concepts, fallback_questions
+from question_bank import concept_for_question, bank_questions, serve_questions
+
+class NoLLM:
+    def invoke(self, prompt):
+        raise RuntimeError("offline")
+
+def use_temp_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(db_setup, "DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+
+def test_concept_for_question_without_concepts():
+    assert concept_for_question("What is a closure?", [], "python") == "python"
+    assert concept_for_question("What is a closure?", []) is None
+    assert concept_for_question("What is a closure?", ["closure", "decorator"]) == "closure"
+
+def test_extract_key_concepts_falls_back_to_topic():
+    # Text, but no candidate phrases: only stop words and short tokens
+    content = {"notes.txt": "the of and to in it is on a an"}
+    concepts = extract_key_concepts(content, "Python", None)
+    assert concepts == ["python 1", "python 2", "python 3", "python 4", "python 5"]
+
+def test_fallback_questions_without_concepts():
+    questions = fallback_questions([], "python")
+    assert len(questions) == 2
+    assert all("python" in q["question"] for q in questions)
+
+def test_empty_concepts_quiz_path(monkeypatch, tmp_path):
+    use_temp_database(monkeypatch, tmp_path)
+    question = {"question": "What does a closure capture?", "options": {"A": "a", "B": "b", "C": "c", "D": "d"}, "correct": "A"}
+    stored = bank_questions([question], "Python", [], "basic", "none")
+    assert len(stored) == 1
+    questions, used = serve_questions(NoLLM(), [], "Python", 0, num_questions=2)
+    assert len(questions) == 2
+    assert used == {q["question"] for q in questions}
@@ -0,0 +1,315 @@
+# vector_index.py
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are only serialized within a process
+    fcntl = None
+
+DEFAULT_INDEX_DIR = "data/vector_index"
+WHITESPACE = re.compile(r"\s")
+
+def chunk_text(text, chunk_chars=800, overlap=100):
+    """Split text into overlapping chunks of about `chunk_chars`, breaking at whitespace.
+
+    Returns a list of (offset, chunk) pairs.
+    """
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            space = WHITESPACE.search(text, end)
+            end = space.start() if space and space.start() - end < chunk_chars // 4 else end
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append((start, chunk))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+@contextmanager
+def _directory_lock(directory):
+    """Exclusive lock on an index directory, held across every process that uses it."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield  # Closing the file releases the lock
+
+def _replace_atomically(path, write, suffix=""):
+    """Write `path` through a uniquely named temporary file in the same directory."""
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=suffix, delete=False) as f:
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, path)
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+def kmeans(matrix, num_clusters, iterations=10, seed=0):
+    """Spherical k-means on normalized rows; returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), num_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]  # Keep the old centroid for empty clusters
+        centroids = _normalize_rows(sums)
+    return centroids, np.argmax(matrix @ centroids.T, axis=1)
+
+class VectorIndex:
+    """Persistent cosine-similarity index over document chunks.
+
+    Vectors are kept L2-normalized in one float32 matrix and searched by brute force
+    (a single matrix-vector product). Above `ivf_threshold` rows an inverted-file
+    partitioning is built with k-means, and queries only scan the `nprobe` closest
+    partitions. Processes sharing a directory take a file lock to load, sync and save,
+    and sync merges onto whatever another process saved last.
+    """
+
+    def __init__(self, directory=DEFAULT_INDEX_DIR, ivf_threshold=20000, nprobe=8):
+        self.directory = directory
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self.model_name = None
+        self.documents = {}  # filename -> sha256 of the indexed version
+        self.chunks = []  # [filename, offset, text] per row
+        self.file_ids = np.zeros(0, dtype=np.int32)  # Per row, the file's number in _file_numbers
+        self._file_numbers = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+        self._mtime = None  # chunks.json version this process last loaded or saved
+        self.load()
+
+    def _stored_mtime(self):
+        try:
+            return os.stat(os.path.join(self.directory, "chunks.json")).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        if not os.path.exists(os.path.join(self.directory, "chunks.json")):
+            return
+        with _directory_lock(self.directory):
+            self._load()
+
+    def _load(self):
+        meta_path = os.path.join(self.directory, "chunks.json")
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        if not (os.path.exists(meta_path) and os.path.exists(vectors_path)):
+            return
+        mtime = self._stored_mtime()
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            vectors = np.load(vectors_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable vector index in {self.directory}: {e}")
+            return
+        if len(vectors) != len(meta["chunks"]):
+            return  # Caught between another process's writes; picked up on the next refresh
+        with self._lock:
+            self._mtime = mtime
+            self.model_name = meta["model"]
+            self.documents = meta["documents"]
+            self.chunks = meta["chunks"]
+            self.vectors = vectors
+            self._index_files()
+            self._load_partitions()
+
+    def _index_files(self):
+        numbers = {}
+        self.file_ids = np.fromiter(
+            (numbers.setdefault(f, len(numbers)) for f, _, _ in self.chunks), dtype=np.int32, count=len(self.chunks)
+        )
+        self._file_numbers = numbers
+
+    def _load_partitions(self):
+        ivf_path = os.path.join(self.directory, "ivf.npz")
+        if len(self.chunks) >= self.ivf_threshold and os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                if len(ivf["assignments"]) == len(self.chunks):
+                    self._set_partitions(ivf["centroids"], ivf["assignments"])
+                    return
+        self._build_partitions()
+
+    def _set_partitions(self, centroids, assignments):
+        self._centroids = centroids
+        self._assignments = assignments
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(centroids))]
+
+    def save(self):
+        with _directory_lock(self.directory):
+            self._save()
+
+    def _save(self):
+        with self._lock:
+            meta = {"model": self.model_name, "documents": self.documents, "chunks": self.chunks}
+            vectors = np.ascontiguousarray(self.vectors, dtype=np.float32)
+            centroids, assignments = self._centroids, self._assignments
+        _replace_atomically(os.path.join(self.directory, "vectors.npy"), lambda f: np.save(f, vectors), ".npy")
+        _replace_atomically(os.path.join(self.directory, "chunks.json"), lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        with self._lock:
+            self._mtime = self._stored_mtime()
+        ivf_path = os.path.join(self.directory, "ivf.npz")
+        if centroids is not None:
+            _replace_atomically(ivf_path, lambda f: np.savez(f, centroids=centroids, assignments=assignments), ".npz")
+        elif os.path.exists(ivf_path):
+            os.remove(ivf_path)
+
+    def refresh(self):
+        """Reload from disk if another process has saved the index since this one last did."""
+        if self._stored_mtime() != self._mtime:
+            self.load()
+
+    def _build_partitions(self):
+        n = len(self.chunks)
+        if n < self.ivf_threshold:
+            self._centroids, self._assignments, self._lists = None, None, None
+            return
+        self._set_partitions(*kmeans(np.asarray(self.vectors), int(np.sqrt(n))))
+
+    def sync(self, content, versions, embedding_model, batch_size=64):
+        """Bring the index in line with `content` ({filename: text}).
+
+        `versions` maps each filename to a content hash; documents whose hash is unchanged
+        keep their rows, changed or new ones are re-chunked and embedded, and missing ones
+        are dropped. Switching embedding models rebuilds everything.
+        Returns the number of documents (re)indexed.
+        """
+        with _directory_lock(self.directory):
+            if self._stored_mtime() != self._mtime:
+                self._load()  # Merge onto another process's latest save, not our stale copy
+            return self._sync(content, versions, embedding_model, batch_size)
+
+    def _sync(self, content, versions, embedding_model, batch_size):
+        model_name = getattr(embedding_model, "model_name", getattr(embedding_model, "model", None))
+        with self._lock:
+            rebuild = model_name != self.model_name
+            current = {} if rebuild else dict(self.documents)
+            stale = {f for f in current if versions.get(f) != current[f]}
+            changed = [f for f in versions if f not in current or f in stale]
+            if not changed and not stale:
+                return 0
+            keep = [i for i, (f, _, _) in enumerate(self.chunks) if not rebuild and f not in stale]
+            chunks = [self.chunks[i] for i in keep]
+            parts = [np.asarray(self.vectors)[keep]] if keep else []
+        new_chunks = []
+        for filename in changed:
+            new_chunks.extend([filename, offset, chunk] for offset, chunk in chunk_text(content[filename]))
+        if new_chunks:
+            embedded = embedding_model.embed_documents([c[2] for c in new_chunks], batch_size=batch_size)
+            parts.append(_normalize_rows(embedded))
+        with self._lock:
+            self.model_name = model_name
+            self.documents = {f: v for f, v in current.items() if f not in stale}
+            self.documents.update({f: versions[f] for f in changed})
+            self.chunks = chunks + new_chunks
+            self.vectors = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+            self._index_files()
+            self._build_partitions()
+        self._save()
+        return len(changed)
+
+    def search(self, query_vector, k=3, filenames=None):
+        """Top-k chunks by cosine similarity as dicts with filename, offset, text and score."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            if not self.chunks:
+                return []
+            vectors = self.vectors
+            chunks = self.chunks
+            file_ids = self.file_ids
+            if filenames is not None:
+                wanted = np.array([self._file_numbers[f] for f in filenames if f in self._file_numbers], dtype=np.int32)
+            if self._centroids is not None:
+                probes = _top_k(self._centroids @ query, self.nprobe)
+                rows = np.concatenate([self._lists[p] for p in probes])
+            else:
+                rows = None
+        if rows is None:
+            scores = np.asarray(vectors @ query)
+            candidates = np.arange(len(scores))
+        else:
+            scores = np.asarray(vectors[rows] @ query)
+            candidates = rows
+        if filenames is not None:
+            allowed = np.isin(file_ids[candidates], wanted)
+            scores, candidates = scores[allowed], candidates[allowed]
+        best = _top_k(scores, k)
+        return [
+            {"filename": chunks[candidates[i]][0], "offset": chunks[candidates[i]][1],
+             "text": chunks[candidates[i]][2], "score": float(scores[i])}
+            for i in best
+        ]
+
+    def __len__(self):
+        return len(self.chunks)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_vector_index(directory=None):
+    """Process-wide VectorIndex for `directory` (VECTOR_INDEX_DIR or the default).
+
+    The index is reloaded whenever another worker process has synced it since.
+    """
+    directory = directory or os.getenv("VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR)
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = VectorIndex(directory)
+            return _indexes[directory]
+        index = _indexes[directory]
+    index.refresh()
+    return index
+
+def retrieve_context(index, embedding_model, concepts, filenames=None, k_per_concept=2, max_chars=3000):
+    """Most relevant chunks for each concept, deduplicated and joined into a prompt excerpt.
+
+    Only chunks of `filenames` are searched when given (the learner's own documents).
+    """
+    if not concepts or not len(index):
+        return ""
+    if filenames is not None:
+        filenames = set(filenames)
+    query_vectors = embedding_model.embed_documents(list(concepts))
+    seen = set()
+    excerpts = []
+    for concept, vector in zip(concepts, query_vectors):
+        for hit in index.search(vector, k=k_per_concept, filenames=filenames):
+            key = (hit["filename"], hit["offset"])
+            if key not in seen:
+                seen.add(key)
+                excerpts.append(f"[{hit['filename']}] {hit['text']}")
+    return "\n\n".join(excerpts)[:max_chars]